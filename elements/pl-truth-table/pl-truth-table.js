@@ -0,0 +1,281 @@
+/* eslint-env browser */
+(() => {
+  function escapeHtml(value) {
+    return String(value)
+      .replace(/&/g, '&amp;')
+      .replace(/</g, '&lt;')
+      .replace(/>/g, '&gt;')
+      .replace(/"/g, '&quot;')
+      .replace(/'/g, '&#39;');
+  }
+
+  // Input cells of a row, with the first input as the most significant bits
+  function inputCells(table, row) {
+    const cells = [];
+    // Tables with sample-rows list the row of the full table shown at each position
+    let rest = table.rowIndices ? table.rowIndices[row - table.start] : row;
+    for (let j = table.inputWidths.length - 1; j >= 0; j--) {
+      const width = table.inputWidths[j];
+      const size = 2 ** width;
+      const bits = (rest % size).toString(2).padStart(width, '0');
+      rest = Math.floor(rest / size);
+      const text = Array.from(bits, (bit) =>
+        bit === '1' ? table.alphabet[0] : table.alphabet[1],
+      ).join('');
+      cells.unshift(`<td class="input-column">${escapeHtml(text)}</td>`);
+    }
+    return cells.join('');
+  }
+
+  function badges(column, offset) {
+    const flag = column.flags ? column.flags[offset] : '-';
+    if (flag === '1') {
+      return '<span class="input-group-text"><span class="badge text-bg-success"><i class="fa fa-check" aria-label="correct"></i></span></span>';
+    }
+    if (flag === '0') {
+      return '<span class="input-group-text"><span class="badge text-bg-danger"><i class="fa fa-times" aria-label="incorrect"></i></span></span>';
+    }
+    return '';
+  }
+
+  function formatError(column, row) {
+    let error = column.errors[row];
+    if (error === undefined || error === null) {
+      return '';
+    }
+    // With aggregate-format-errors, only the kind of each error is included
+    if (column.errorMessages) {
+      error = column.errorMessages[error];
+    }
+    return (
+      '<a role="button" class="btn btn-light border d-flex align-items-center text-danger"' +
+      ' data-bs-toggle="popover" data-bs-html="true" title="Format Error"' +
+      ' data-bs-placement="auto" data-bs-trigger="focus" tabindex="0"' +
+      ` data-bs-content="${escapeHtml(error)}">` +
+      '<span class="me-1">Invalid</span> <i class="fa fa-exclamation-triangle" aria-hidden="true"></i></a>'
+    );
+  }
+
+  function outputCell(table, column, k, row) {
+    const offset = row - table.start;
+    if (table.showValues) {
+      const width = column.valueWidth;
+      const value = column.values.slice(offset * width, (offset + 1) * width);
+      return `<td class="output-column">${escapeHtml(value)}</td>`;
+    }
+    const sub = column.sub[offset] ?? '';
+    const feedback = badges(column, offset) + formatError(column, row);
+    if (table.panel === 'submission') {
+      return (
+        '<td class="output-column"><div class="result-container">' +
+        `${escapeHtml(sub)}<span class="input-group-append">${feedback}</span></div></td>`
+      );
+    }
+    return (
+      '<td class="output-column"><div class="result-container">' +
+      `<input type="text" name="${escapeHtml(`${table.name}_${row}_${k}`)}"` +
+      ` class="form-control" value="${escapeHtml(sub)}"` +
+      ` style="width:${column.width}px" placeholder="${escapeHtml(column.placeholder)}" />` +
+      `<span class="input-group-append">${feedback}</span></div></td>`
+    );
+  }
+
+  function initialize(script) {
+    const table = JSON.parse(script.textContent);
+    const block = script.closest('.t-tbl-block');
+    const tbody = block.querySelector('tbody');
+    let next = table.start;
+
+    function renderRows(count) {
+      const end = Math.min(next + count, table.numRows);
+      const html = [];
+      for (let row = next; row < end; row++) {
+        html.push(
+          `<tr>${inputCells(table, row)}${table.columns
+            .map((column, k) => outputCell(table, column, k, row))
+            .join('')}</tr>`,
+        );
+      }
+      next = end;
+      const rows = document.createElement('tbody');
+      rows.innerHTML = html.join('');
+      if (window.bootstrap) {
+        rows
+          .querySelectorAll('[data-bs-toggle="popover"]')
+          .forEach((el) => window.bootstrap.Popover.getOrCreateInstance(el));
+      }
+      tbody.append(...rows.children);
+    }
+
+    // Append the next batch of rows whenever the end of the table scrolls into view
+    const sentinel = document.createElement('div');
+    block.querySelector('table').after(sentinel);
+    const observer = new IntersectionObserver(
+      (entries) => {
+        if (entries.some((entry) => entry.isIntersecting)) {
+          renderRows(table.batch);
+          observer.unobserve(sentinel);
+          if (next < table.numRows) {
+            // Observing again re-checks the sentinel if it is still in view
+            observer.observe(sentinel);
+          } else {
+            sentinel.remove();
+          }
+        }
+      },
+      { rootMargin: '400px' },
+    );
+    observer.observe(sentinel);
+
+    // Every input must exist when the form is posted, so render the rest first
+    const form = block.closest('form');
+    if (form && table.panel === 'question' && !table.showValues) {
+      form.addEventListener('submit', () => renderRows(table.numRows), true);
+    }
+  }
+
+  // With compact-render, rows rendered on the server only have bare cells, and
+  // their placeholders, badges and format errors are added from one description
+  function hydrate(script) {
+    const status = JSON.parse(script.textContent);
+    const block = script.closest('.t-tbl-block');
+    const rows = block.querySelectorAll('tbody > tr');
+    for (let row = 0; row < status.numRows; row++) {
+      const cells = rows[row].children;
+      status.columns.forEach((column, k) => {
+        const cell = cells[status.numInputs + k];
+        const input = cell.querySelector('input');
+        if (input) {
+          input.placeholder = column.placeholder;
+        }
+        const feedback = badges(column, row) + formatError(column, row);
+        if (!feedback) {
+          return;
+        }
+        const container = document.createElement('div');
+        container.className = 'result-container';
+        container.append(...cell.childNodes);
+        container.insertAdjacentHTML(
+          'beforeend',
+          `<span class="input-group-append">${feedback}</span>`,
+        );
+        cell.append(container);
+      });
+    }
+    if (window.bootstrap) {
+      block
+        .querySelectorAll('[data-bs-toggle="popover"]')
+        .forEach((el) => window.bootstrap.Popover.getOrCreateInstance(el));
+    }
+  }
+
+  // Post the whole table as one JSON list in row-major order instead of a field per
+  // cell. formdata fires after submit, so all rows have been rendered by then.
+  function initializePacked(marker) {
+    const form = marker.closest('form');
+    if (!form) {
+      return;
+    }
+    const name = marker.dataset.name;
+    const numRows = Number(marker.dataset.numRows);
+    const numOutputs = Number(marker.dataset.numOutputs);
+    form.addEventListener('formdata', (event) => {
+      const cells = [];
+      for (let row = 0; row < numRows; row++) {
+        for (let k = 0; k < numOutputs; k++) {
+          const cellName = `${name}_${row}_${k}`;
+          cells.push(event.formData.get(cellName));
+          event.formData.delete(cellName);
+        }
+      }
+      event.formData.set(name, JSON.stringify(cells));
+    });
+  }
+
+  // With client-validation, cells are checked with the rules parse uses before the
+  // form is posted, so malformed tables are fixed here instead of on a round trip
+  function initializeValidation(script) {
+    const schema = JSON.parse(script.textContent);
+    const block = script.closest('.t-tbl-block');
+    const form = block.closest('form');
+    if (!form) {
+      return;
+    }
+
+    function cellError(input, k) {
+      const value = input.value.toLowerCase();
+      const messages = schema.messages[k];
+      if (value === '') {
+        return messages.blank;
+      }
+      if (schema.widths && value.length !== schema.widths[k]) {
+        return messages.length;
+      }
+      if ([...value].some((c) => !schema.alphabet.includes(c))) {
+        return messages.alphabet;
+      }
+      return '';
+    }
+
+    function check(input, k) {
+      const error = cellError(input, k);
+      input.classList.toggle('is-invalid', error !== '');
+      input.title = error;
+      return error === '';
+    }
+
+    const summary = document.createElement('div');
+    summary.className = 'text-danger small truth-table-invalid';
+    summary.hidden = true;
+    script.after(summary);
+
+    // Once a cell has been flagged, clear it as soon as it is fixed
+    block.addEventListener('input', (event) => {
+      const input = event.target;
+      if (input.classList.contains('is-invalid')) {
+        check(input, Number(input.name.split('_').pop()));
+      }
+    });
+
+    // Registered after initialize, so every row has been rendered by now. Saving
+    // is still allowed, so that a partly filled table is not lost.
+    form.addEventListener(
+      'submit',
+      (event) => {
+        if (event.submitter && event.submitter.value === 'save') {
+          return;
+        }
+        const invalid = [];
+        for (let row = 0; row < schema.numRows; row++) {
+          schema.messages.forEach((_, k) => {
+            const input = form.elements.namedItem(`${schema.name}_${row}_${k}`);
+            if (input && !check(input, k)) {
+              invalid.push(input);
+            }
+          });
+        }
+        summary.hidden = invalid.length === 0;
+        if (invalid.length) {
+          summary.textContent = `${invalid.length} cell(s) are not valid yet.`;
+          event.preventDefault();
+          event.stopImmediatePropagation();
+          invalid[0].focus();
+        }
+      },
+      true,
+    );
+  }
+
+  function initializeAll() {
+    document.querySelectorAll('script.truth-table-status').forEach(hydrate);
+    document.querySelectorAll('script.truth-table-rows').forEach(initialize);
+    document.querySelectorAll('input.truth-table-packed').forEach(initializePacked);
+    document.querySelectorAll('script.truth-table-schema').forEach(initializeValidation);
+  }
+
+  if (document.readyState === 'loading') {
+    document.addEventListener('DOMContentLoaded', initializeAll);
+  } else {
+    initializeAll();
+  }
+})();
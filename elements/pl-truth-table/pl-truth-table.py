@@ -1,11 +1,28 @@
 import csv
+import json
+import os
+import random
 import re
+import sys
+import time
+from bisect import bisect_right
+from collections import OrderedDict
+from collections.abc import Callable, Iterator, Sequence
+from contextlib import contextmanager, nullcontext
+from functools import lru_cache
 from io import StringIO
+from itertools import product
+from typing import TYPE_CHECKING, Any, NamedTuple
 
-import chevron
 import lxml.html
 import prairielearn as pl
 
+# Only imported where they are needed, so that e.g. a worker that just parses
+# and grades does not load the template engine: chevron (render), ast
+# (expression attribute), hashlib (render cache) and logging (profiling)
+if TYPE_CHECKING:
+    import ast
+
 BIT_WIDTH_DEFAULT = "1"
 CORRECT_ANSWER_DEFAULT = None
 ALPHABET_DEFAULT = "10"
@@ -18,8 +35,53 @@ SHOW_CELL_SCORE_DEFAULT = True
 PARTIAL_CREDIT_DEFAULT = True
 SHOW_COLUMN_SCORE_DEFAULT = False
 CONSTANT_SIZE_DEFAULT = 0
+PACKED_ANSWERS_DEFAULT = False
+EXPRESSION_DEFAULT = None
+VISIBLE_ROWS_DEFAULT = 0
+PROFILE_DEFAULT = False
+PACKED_SUBMISSION_DEFAULT = False
+AGGREGATE_FORMAT_ERRORS_DEFAULT = False
+SAMPLE_ROWS_DEFAULT = 0
+COMPACT_RENDER_DEFAULT = False
+CLIENT_VALIDATION_DEFAULT = False
 
 TRUTH_TABLE_MUSTACHE_TEMPLATE_NAME = "pl-truth-table.mustache"
+SPEC_CACHE_SIZE = 256
+# Set to "log" or to the path of a JSON lines file to profile every table
+PROFILE_ENV_VAR = "PL_TRUTH_TABLE_PROFILE"
+ROWS_CACHE_SIZE = 32
+EXPRESSION_CACHE_SIZE = 256
+# Characters of rendered HTML kept in memory for the answer panel and read-only tables
+RENDER_CACHE_MAX_CHARS = 32 * 1024 * 1024
+# Directory to also keep rendered HTML in, shared by all workers (optional)
+RENDER_CACHE_ENV_VAR = "PL_TRUTH_TABLE_RENDER_CACHE"
+# Table models kept for the other panels of the same submission
+MODEL_CACHE_SIZE = 16
+
+# Correct value of rows that accept any answer, see parse_minterms()
+DONT_CARE = "-"
+SPARSE_TERM_PATTERN = r"([md])\(([^)]*)\)"
+# Tokens of a dense correct answer, and the whitespace removed from its lists
+CORRECT_ANSWER_TOKEN_PATTERN = r"[\[\],]|[^,\[\]]+"
+CORRECT_ANSWER_WHITESPACE = str.maketrans("", "", " \t\n\r\f\v")
+
+# Syntax allowed in the expression attribute: inputs, 0/1 and logic operators
+EXPRESSION_NODE_TYPES = (
+    "Expression",
+    "BoolOp",
+    "And",
+    "Or",
+    "UnaryOp",
+    "Not",
+    "Invert",
+    "BinOp",
+    "BitAnd",
+    "BitOr",
+    "BitXor",
+    "Name",
+    "Load",
+    "Constant",
+)
 
 
 def get_headers_as_array(raw_headers: str | None) -> list[str]:
@@ -39,7 +101,48 @@ def get_headers_as_array(raw_headers: str | None) -> list[str]:
     return next(reader)
 
 
-def prepare(element_html: str, data: pl.QuestionData) -> None:
+class TruthTableSpec(NamedTuple):
+    """Element attributes, parsed and validated once per distinct element HTML"""
+
+    name: str
+    label: str | None
+    input_names: tuple[str, ...]
+    output_names: tuple[str, ...]
+    bit_width: str  # raw attribute value, e.g. "1" or "[2, 1]"
+    bit_widths: tuple[int, ...]  # one width per input column
+    num_rows: int  # rows shown, stored and graded
+    table_rows: int  # rows of the full table, 2 ** sum(bit_widths)
+    sample_rows: int  # 0 uses all rows, otherwise a subset per variant
+    alphabet: str
+    correct_answer: str | None
+    expressions: tuple[str, ...]  # one Boolean expression per output column
+    placeholder: str
+    prefill: str
+    constant_size: int
+    visible_rows: int  # rows rendered on the server, 0 renders all of them
+    read_only: bool
+    partial_credit: bool
+    show_cell_score: bool
+    show_column_score: bool
+    packed_answers: bool
+    profile: bool
+    packed_submission: bool  # all cells are posted as one JSON list
+    aggregate_format_errors: bool  # one summary instead of an error per cell
+    compact_render: bool  # bare cells, with feedback added by pl-truth-table.js
+    client_validation: bool  # pl-truth-table.js checks cells before posting
+
+    @property
+    def num_outputs(self) -> int:
+        return len(self.output_names)
+
+
+@lru_cache(maxsize=SPEC_CACHE_SIZE)
+def compile_spec(element_html: str) -> TruthTableSpec:
+    """Parse the element HTML into a TruthTableSpec.
+
+    The result is cached, so prepare/render/parse/grade (and every table on a
+    page that shares the same markup) only parse the attributes once.
+    """
     element = lxml.html.fragment_fromstring(element_html)
     required_attribs = ["answers-name", "input-name", "output-name"]
     optional_attribs = [
@@ -56,31 +159,39 @@ def prepare(element_html: str, data: pl.QuestionData) -> None:
         "bit-width",
         "alphabet",
         "constant-size",
+        "packed-answers",
+        "expression",
+        "visible-rows",
+        "profile",
+        "packed-submission",
+        "aggregate-format-errors",
+        "sample-rows",
+        "compact-render",
+        "client-validation",
     ]
     pl.check_attribs(element, required_attribs, optional_attribs)
 
-    name = pl.get_string_attrib(element, "answers-name")
-    pl.check_answers_names(data, name)
-
-    output_name_string = pl.get_string_attrib(
-        element, "output-name"
-    )  # [X or Y, X and Y]
-    output_name = get_headers_as_array(output_name_string)
-
     # prepare the input variables e.g. ['X', 'Y']
-    variable_string = pl.get_string_attrib(element, "input-name")
-    variables = get_headers_as_array(variable_string)
+    variables = get_headers_as_array(pl.get_string_attrib(element, "input-name"))
+    # [X or Y, X and Y]
+    output_name = get_headers_as_array(pl.get_string_attrib(element, "output-name"))
+
     # check if different bitwidth is provided for each variable
     bit_width = pl.get_string_attrib(element, "bit-width", BIT_WIDTH_DEFAULT)
-    num_rows = 1
     if "," in bit_width:
-        bit_width = bit_width.lstrip("[").rstrip("]").split(",")
-        for x in bit_width:
-            num_rows *= 2 ** int(x)
+        bit_widths = tuple(int(x) for x in bit_width.lstrip("[").rstrip("]").split(","))
     else:
-        num_rows = (
-            2 ** (int(bit_width) * len(variables))
-        )  # Total rows in the truth table based on the number of variables and bit width
+        bit_widths = (int(bit_width),) * len(variables)
+    # Total rows in the truth table based on the number of variables and bit width
+    table_rows = 2 ** sum(bit_widths)
+
+    sample_rows = int(pl.get_string_attrib(element, "sample-rows", SAMPLE_ROWS_DEFAULT))
+    if sample_rows < 0:
+        raise ValueError("The number of sampled rows must be 0 or greater.")
+    if sample_rows >= table_rows:
+        # Sampling every row is the same as showing the whole table in order
+        sample_rows = 0
+    num_rows = sample_rows or table_rows
 
     # Just to test that the number is an integer > 0
     constant_size = int(
@@ -89,50 +200,791 @@ def prepare(element_html: str, data: pl.QuestionData) -> None:
     if constant_size < 0:
         raise ValueError("The constant size for inputs must 0 or greater.")
 
-    # Get the single correct-answer string from the HTML and split it for each row
-    output_string = None
-    if "correct_answers" in data and name in data["correct_answers"]:
-        output_string = data["correct_answers"][name]
-    else:
-        output_string = pl.get_string_attrib(
-            element, "correct-answer", CORRECT_ANSWER_DEFAULT
+    visible_rows = int(
+        pl.get_string_attrib(element, "visible-rows", VISIBLE_ROWS_DEFAULT)
+    )
+    if visible_rows < 0:
+        raise ValueError("The number of visible rows must be 0 or greater.")
+
+    correct_answer = pl.get_string_attrib(
+        element, "correct-answer", CORRECT_ANSWER_DEFAULT
+    )
+    expressions = get_headers_as_array(
+        pl.get_string_attrib(element, "expression", EXPRESSION_DEFAULT)
+    )
+    if expressions:
+        if correct_answer is not None:
+            raise ValueError(
+                'Only one of "correct-answer" and "expression" can be provided.'
+            )
+        if len(expressions) != len(output_name):
+            raise ValueError(
+                f"The number of expressions ({len(expressions)}) must match the number of output names ({len(output_name)})."
+            )
+        if any(width != 1 for width in bit_widths):
+            raise ValueError('"expression" requires a bit-width of 1 for all inputs.')
+        for expression in expressions:
+            compile_expression(expression)
+
+    return TruthTableSpec(
+        name=pl.get_string_attrib(element, "answers-name"),
+        label=pl.get_string_attrib(element, "label", LABEL_DEFAULT),
+        input_names=tuple(variables),
+        output_names=tuple(output_name),
+        bit_width=bit_width,
+        bit_widths=bit_widths,
+        num_rows=num_rows,
+        table_rows=table_rows,
+        sample_rows=sample_rows,
+        alphabet=pl.get_string_attrib(element, "alphabet", ALPHABET_DEFAULT),
+        correct_answer=correct_answer,
+        expressions=tuple(expressions),
+        placeholder=pl.get_string_attrib(element, "placeholder", PLACEHOLDER_DEFAULT),
+        prefill=pl.get_string_attrib(element, "prefill", PREFILL_DEFAULT),
+        constant_size=constant_size,
+        visible_rows=visible_rows,
+        read_only=_is_read_only(element),
+        partial_credit=pl.get_boolean_attrib(
+            element, "partial-credit", PARTIAL_CREDIT_DEFAULT
+        ),
+        show_cell_score=pl.get_boolean_attrib(
+            element, "show-cell-score", SHOW_CELL_SCORE_DEFAULT
+        ),
+        show_column_score=pl.get_boolean_attrib(
+            element, "show-column-score", SHOW_COLUMN_SCORE_DEFAULT
+        ),
+        packed_answers=pl.get_boolean_attrib(
+            element, "packed-answers", PACKED_ANSWERS_DEFAULT
+        ),
+        profile=pl.get_boolean_attrib(element, "profile", PROFILE_DEFAULT),
+        packed_submission=pl.get_boolean_attrib(
+            element, "packed-submission", PACKED_SUBMISSION_DEFAULT
+        ),
+        aggregate_format_errors=pl.get_boolean_attrib(
+            element, "aggregate-format-errors", AGGREGATE_FORMAT_ERRORS_DEFAULT
+        ),
+        compact_render=pl.get_boolean_attrib(
+            element, "compact-render", COMPACT_RENDER_DEFAULT
+        ),
+        client_validation=pl.get_boolean_attrib(
+            element, "client-validation", CLIENT_VALIDATION_DEFAULT
+        ),
+    )
+
+
+ProfileSink = Callable[[dict[str, Any]], None]
+
+
+def log_profile_sink(record: dict[str, Any]) -> None:
+    """Write a profile record to the "pl-truth-table" logger"""
+    import logging
+
+    logger = logging.getLogger("pl-truth-table")
+    if not logger.handlers:
+        # The workers configure no logging, so without a handler of its own
+        # the INFO records would be dropped; they go to stderr as JSON lines
+        handler = logging.StreamHandler(sys.stderr)
+        handler.setFormatter(logging.Formatter("%(message)s"))
+        logger.addHandler(handler)
+        logger.setLevel(logging.INFO)
+        logger.propagate = False
+    logger.info(json.dumps(record))
+
+
+class JsonLinesProfileSink:
+    """Append each profile record to a file as one JSON line"""
+
+    def __init__(self, path: str) -> None:
+        self.path = path
+
+    def __call__(self, record: dict[str, Any]) -> None:
+        with open(self.path, "a", encoding="utf-8") as f:
+            f.write(json.dumps(record) + "\n")
+
+
+def _profile_sink_from_env() -> ProfileSink | None:
+    target = os.environ.get(PROFILE_ENV_VAR, "")
+    if not target:
+        return None
+    if target == "log":
+        return log_profile_sink
+    return JsonLinesProfileSink(target)
+
+
+# Where profile records of all tables go; None profiles only tables with
+# profile="true", which are sent to the log
+_profile_sink = _profile_sink_from_env()
+
+
+def set_profile_sink(sink: ProfileSink | None) -> None:
+    """Profile every table and send the records to sink (None to stop)"""
+    global _profile_sink
+    _profile_sink = sink
+
+
+class PhaseProfile:
+    """Wall time of one lifecycle phase and its steps, with row/cell counts"""
+
+    enabled = True
+
+    def __init__(self, phase: str, name: str, sink: ProfileSink) -> None:
+        self.sink = sink
+        self.record: dict[str, Any] = {"phase": phase, "name": name, "steps": {}}
+        self.start = time.perf_counter()
+
+    @contextmanager
+    def step(self, label: str) -> Iterator[None]:
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            elapsed = time.perf_counter() - start
+            self.record["steps"][label] = round(elapsed * 1000, 3)
+
+    def finish(self, **counts: int) -> None:
+        self.record["ms"] = round((time.perf_counter() - self.start) * 1000, 3)
+        self.record.update(counts)
+        self.sink(self.record)
+
+
+class _DisabledProfile:
+    """Used while profiling is off, so instrumented code does no extra work"""
+
+    enabled = False
+
+    def step(self, label: str) -> nullcontext:
+        return _NO_STEP
+
+    def finish(self, **counts: int) -> None:
+        pass
+
+
+_NO_STEP = nullcontext()
+_DISABLED_PROFILE = _DisabledProfile()
+
+
+def start_profile(phase: str, spec: TruthTableSpec) -> PhaseProfile | _DisabledProfile:
+    sink = _profile_sink
+    if sink is None:
+        if not spec.profile:
+            return _DISABLED_PROFILE
+        sink = log_profile_sink
+    return PhaseProfile(phase, spec.name, sink)
+
+
+@lru_cache(maxsize=ROWS_CACHE_SIZE)
+def input_rows(
+    bit_widths: tuple[int, ...], alphabet: str
+) -> tuple[tuple[str, ...], ...]:
+    """Enumerate the input cells of every row, already mapped to the alphabet.
+
+    Each distinct width gets a lookup table of all its values, and the rows are
+    the cartesian product of those tables (first input is the most significant),
+    so the whole matrix is built in one batch and shared between views.
+    """
+    to_alphabet = str.maketrans({"1": alphabet[0], "0": alphabet[1]})
+    tables = {
+        width: tuple(
+            format(value, f"0{width}b").translate(to_alphabet)
+            for value in range(2**width)
         )
-    if output_string is None:
+        for width in set(bit_widths)
+    }
+    return tuple(product(*(tables[width] for width in bit_widths)))
+
+
+def sampled_input_rows(
+    bit_widths: tuple[int, ...], alphabet: str, rows: list[int]
+) -> list[tuple[str, ...]]:
+    """Input cells of the given rows of the full table, mapped to the alphabet"""
+    to_alphabet = str.maketrans({"1": alphabet[0], "0": alphabet[1]})
+    fields = []
+    shift = sum(bit_widths)
+    for width in bit_widths:
+        shift -= width
+        fields.append((shift, (1 << width) - 1, f"0{width}b"))
+    return [
+        tuple(
+            format((row >> shift) & mask, pattern).translate(to_alphabet)
+            for shift, mask, pattern in fields
+        )
+        for row in rows
+    ]
+
+
+def sampled_params_key(spec: TruthTableSpec) -> str:
+    return f"{spec.name}_sampled_rows"
+
+
+def choose_sampled_rows(spec: TruthTableSpec, data: pl.QuestionData) -> list[int]:
+    """Pick the rows of this variant, from its seed and the answers name.
+
+    The rows are kept in params, so the other phases (and regrading a stored
+    variant) use the same rows without sampling again.
+    """
+    key = sampled_params_key(spec)
+    rows = data["params"].get(key)
+    if rows is None:
+        rng = random.Random(f"{data.get('variant_seed')}:{spec.name}")
+        rows = sorted(rng.sample(range(spec.table_rows), spec.num_rows))
+        data["params"][key] = rows
+    return rows
+
+
+def sampled_rows(spec: TruthTableSpec, data: pl.QuestionData) -> list[int] | None:
+    """Rows of the full table shown at each position, None if all rows are shown"""
+    if not spec.sample_rows:
+        return None
+    return data["params"][sampled_params_key(spec)]
+
+
+# Tokenized template sections per template path, with the mtime they were read at
+_template_cache: dict[str, tuple[int, dict[str, list[tuple[str, str]]]]] = {}
+
+
+def get_template_sections(
+    path: str = TRUTH_TABLE_MUSTACHE_TEMPLATE_NAME,
+) -> dict[str, list[tuple[str, str]]]:
+    """Return the tokens of each top-level section of the template.
+
+    The template is read and tokenized once per worker, and again only if its
+    mtime changes (e.g. after a course sync). Rendering one section instead of
+    the whole template skips the panels that are not displayed.
+    """
+    path = os.path.abspath(path)
+    mtime = os.stat(path).st_mtime_ns
+    cached = _template_cache.get(path)
+    if cached is not None and cached[0] == mtime:
+        return cached[1]
+
+    import chevron
+
+    with open(path, "r", encoding="utf-8") as f:
+        tokens = chevron.tokenizer.tokenize(f.read())
+    sections: dict[str, list[tuple[str, str]]] = {}
+    depth = 0
+    current: list[tuple[str, str]] = []
+    for tag, key in tokens:
+        if depth == 0:
+            current = sections.setdefault(key, []) if tag == "section" else []
+        if tag in ("section", "inverted section"):
+            depth += 1
+        elif tag == "end":
+            depth -= 1
+        if depth > 0 or tag == "end":
+            current.append((tag, key))
+    _template_cache[path] = (mtime, sections)
+    return sections
+
+
+class AnswerColumn(NamedTuple):
+    """The correct values of one output column, concatenated row by row"""
+
+    width: int
+    values: str
+
+    def cell(self, row: int) -> str:
+        return self.values[row * self.width : (row + 1) * self.width]
+
+
+def store_correct_columns(
+    spec: TruthTableSpec, data: pl.QuestionData, columns: list[AnswerColumn]
+) -> None:
+    """Save the correct answers, packed or as one entry per cell"""
+    name = spec.name
+    if spec.packed_answers:
+        data["correct_answers"][name] = {
+            "width": [column.width for column in columns],
+            "values": [column.values for column in columns],
+        }
+        return
+    for k, column in enumerate(columns):
+        for row_index in range(spec.num_rows):
+            data["correct_answers"][f"{name}_{row_index}_{k}"] = column.cell(row_index)
+
+
+def packed_correct_columns(spec: TruthTableSpec, packed: Any) -> list[AnswerColumn]:
+    """Validate correct answers as store_correct_columns packs them"""
+    try:
+        columns = [
+            AnswerColumn(width, values)
+            for width, values in zip(packed["width"], packed["values"], strict=True)
+        ]
+    except (KeyError, TypeError, ValueError) as e:
+        raise ValueError(
+            f'data["correct_answers"][{spec.name}] must have a "width" and a "values" per output.'
+        ) from e
+    if len(columns) != spec.num_outputs:
         raise ValueError(
-            f'data["correct_answers"][{name}] not declared in server.py. Alternatively, fill out element attribute "correct-answer"'
+            f"The number of packed output columns ({len(columns)}) must match the number of output names ({spec.num_outputs})."
+        )
+    for column in columns:
+        if (
+            not isinstance(column.width, int)
+            or not isinstance(column.values, str)
+            or column.width < 1
+            or len(column.values) != column.width * spec.num_rows
+        ):
+            raise ValueError(
+                f"Each packed output column must have a width and {spec.num_rows} values of that width."
+            )
+    return columns
+
+
+def get_correct_columns(
+    spec: TruthTableSpec, data: pl.QuestionData
+) -> list[AnswerColumn]:
+    """Read the correct answers saved by prepare, in either storage format"""
+    name = spec.name
+    packed = data["correct_answers"].get(name)
+    if isinstance(packed, dict):
+        return [
+            AnswerColumn(width, values)
+            for width, values in zip(packed["width"], packed["values"])
+        ]
+    # Variants prepared without packed-answers have one entry per cell
+    columns = []
+    for k in range(spec.num_outputs):
+        cells = [
+            pl.from_json(data["correct_answers"][f"{name}_{row_index}_{k}"])
+            for row_index in range(spec.num_rows)
+        ]
+        columns.append(AnswerColumn(len(cells[0]), "".join(cells)))
+    return columns
+
+
+def match_mask(submitted: Sequence[str | None], column: AnswerColumn) -> int:
+    """Bitset of the rows whose submitted value matches the column (ignoring case)"""
+    expected = column.values.lower()
+    width = column.width
+    has_dont_care = DONT_CARE in expected
+    flags = "".join(
+        "1"
+        if a_sub is not None
+        and (
+            a_sub.lower() == (cell := expected[row * width : (row + 1) * width])
+            or (has_dont_care and cell == DONT_CARE)
         )
+        else "0"
+        for row, a_sub in enumerate(submitted)
+    )
+    return int(flags[::-1], 2)
+
+
+def mask_to_flags(mask: int, num_rows: int) -> str:
+    """Expand a row bitset into a string of "1"/"0" flags indexed by row"""
+    return format(mask, f"0{num_rows}b")[::-1]
+
+
+@lru_cache(maxsize=ROWS_CACHE_SIZE)
+def cell_names(name: str, num_rows: int, k: int) -> tuple[str, ...]:
+    """Answer names of the cells in output column k"""
+    return tuple(f"{name}_{index}_{k}" for index in range(num_rows))
+
 
-    output_list = (
-        re.split(r"\],\s*\[", output_string) if output_string is not None else None
+def cell_partial_score(
+    correct: bool, a_sub: str | None, all_or_nothing_failed: bool
+) -> dict[str, Any]:
+    if correct:
+        partial_score = {"score": 1, "feedback": "Correct."}
+    elif a_sub is None:
+        partial_score = {"score": 0, "feedback": "Missing input."}
+    else:
+        partial_score = {"score": 0, "feedback": "Incorrect."}
+    if all_or_nothing_failed:
+        partial_score["weight"] = 0.0
+    return partial_score
+
+
+@lru_cache(maxsize=EXPRESSION_CACHE_SIZE)
+def compile_expression(expression: str) -> "ast.Expression":
+    """Parse a Boolean expression such as "(X and Y) or not Z" or "X xor Y"."""
+    import ast
+
+    allowed_nodes = tuple(
+        getattr(ast, node_type) for node_type in EXPRESSION_NODE_TYPES
     )
-    # check if the number of output lists is equal to the number of output names
-    if output_list is not None:
-        if len(output_list) != len(output_name):
+    try:
+        tree = ast.parse(re.sub(r"\bxor\b", "^", expression.strip()), mode="eval")
+    except SyntaxError as e:
+        raise ValueError(f'Invalid expression "{expression}".') from e
+    for node in ast.walk(tree):
+        if not isinstance(node, allowed_nodes) or (
+            isinstance(node, ast.Constant) and node.value not in (0, 1)
+        ):
             raise ValueError(
-                f"The number of output lists ({len(output_list)}) must match the number of output names ({len(output_name)})."
+                f'Invalid expression "{expression}". Only input names, 0, 1 and the operators and, or, not, xor, &, |, ^, ~ are allowed.'
             )
-    for k, output in enumerate(output_list):
-        output = output.lstrip("[").rstrip("]").replace(" ", "").split(",")
-        if output is not None:
-            if len(output) != num_rows:
-                raise ValueError(
-                    f"The length of the correct answer ({len(output)}) must match the number of rows ({num_rows})."
-                )
-            # check if the value is in the alphabet
-            alphabet = pl.get_string_attrib(element, "alphabet", ALPHABET_DEFAULT)
-            char_level_set = {char for item in set(output) for char in item}
-            if not char_level_set.issubset(set(alphabet)):
-                raise ValueError(
-                    f"Invalid format. Provided output {char_level_set} not in alphabet {set(alphabet)}."
+    return tree
+
+
+@lru_cache(maxsize=ROWS_CACHE_SIZE)
+def input_bitsets(num_inputs: int) -> tuple[int, ...]:
+    """Bitsets over all rows (bit i = row i) of where each 1-bit input is true"""
+    num_rows = 2**num_inputs
+    bitsets = []
+    for j in range(num_inputs):
+        # The first input is the most significant bit of the row index
+        half = 1 << (num_inputs - 1 - j)
+        bitset = ((1 << half) - 1) << half
+        period = 2 * half
+        while period < num_rows:
+            bitset |= bitset << period
+            period *= 2
+        bitsets.append(bitset)
+    return tuple(bitsets)
+
+
+def sampled_input_bitsets(num_inputs: int, rows: tuple[int, ...]) -> tuple[int, ...]:
+    """Bitsets over the sampled rows (bit p = rows[p]) of where each 1-bit input is true"""
+    return tuple(
+        int("".join("1" if row >> shift & 1 else "0" for row in reversed(rows)), 2)
+        for shift in range(num_inputs - 1, -1, -1)
+    )
+
+
+def _evaluate(node: "ast.AST", inputs: dict[str, int], true: int) -> int:
+    import ast
+
+    if isinstance(node, ast.Expression):
+        return _evaluate(node.body, inputs, true)
+    if isinstance(node, ast.Name):
+        if node.id not in inputs:
+            raise ValueError(f'Unknown input "{node.id}" in expression.')
+        return inputs[node.id]
+    if isinstance(node, ast.Constant):
+        return true if node.value else 0
+    if isinstance(node, ast.UnaryOp):
+        return true ^ _evaluate(node.operand, inputs, true)
+    if isinstance(node, ast.BoolOp):
+        values = [_evaluate(value, inputs, true) for value in node.values]
+        result = values[0]
+        for value in values[1:]:
+            result = result & value if isinstance(node.op, ast.And) else result | value
+        return result
+    left = _evaluate(node.left, inputs, true)
+    right = _evaluate(node.right, inputs, true)
+    if isinstance(node.op, ast.BitAnd):
+        return left & right
+    if isinstance(node.op, ast.BitOr):
+        return left | right
+    return left ^ right
+
+
+@lru_cache(maxsize=EXPRESSION_CACHE_SIZE)
+def evaluate_expressions(
+    expressions: tuple[str, ...],
+    input_names: tuple[str, ...],
+    alphabet: str,
+    rows: tuple[int, ...] | None = None,
+) -> tuple[str, ...]:
+    """Compute the output column of each expression for all rows at once.
+
+    Every input is a bitset over the rows, so each operator in the expression is
+    a single big-integer operation rather than one evaluation per row. With
+    rows, only those rows of the full table are computed.
+    """
+    if rows is None:
+        num_rows = 2 ** len(input_names)
+        bitsets = input_bitsets(len(input_names))
+    else:
+        num_rows = len(rows)
+        bitsets = sampled_input_bitsets(len(input_names), rows)
+    true = (1 << num_rows) - 1
+    inputs = dict(zip(input_names, bitsets))
+    to_alphabet = str.maketrans({"1": alphabet[0], "0": alphabet[1]})
+    return tuple(
+        mask_to_flags(
+            _evaluate(compile_expression(expression), inputs, true), num_rows
+        ).translate(to_alphabet)
+        for expression in expressions
+    )
+
+
+def _parse_row_ranges(indices: str, num_rows: int) -> list[tuple[int, int]]:
+    """The (first, last) rows listed in "m(...)" or "d(...)", in the given order"""
+    ranges = []
+    for part in indices.split(","):
+        part = part.strip()
+        if not part:
+            continue
+        first, _, last = part.partition("..")
+        first = int(first)
+        last = int(last) if last else first
+        if not 0 <= first <= last < num_rows:
+            raise ValueError(
+                f'Invalid row "{part}" in correct answer. Rows must be between 0 and {num_rows - 1}.'
+            )
+        ranges.append((first, last))
+    return ranges
+
+
+def _merge_row_ranges(ranges: list[tuple[int, int]]) -> list[tuple[int, int]]:
+    """Sorted, disjoint ranges of the same rows"""
+    merged: list[tuple[int, int]] = []
+    for first, last in sorted(ranges):
+        if merged and first <= merged[-1][1] + 1:
+            merged[-1] = (merged[-1][0], max(merged[-1][1], last))
+        else:
+            merged.append((first, last))
+    return merged
+
+
+def _row_range_overlap(
+    a: list[tuple[int, int]], b: list[tuple[int, int]]
+) -> list[tuple[int, int]]:
+    """Rows in both of two lists of merged ranges, as ranges"""
+    overlap = []
+    i = j = 0
+    while i < len(a) and j < len(b):
+        first, last = max(a[i][0], b[j][0]), min(a[i][1], b[j][1])
+        if first <= last:
+            overlap.append((first, last))
+        if a[i][1] < b[j][1]:
+            i += 1
+        else:
+            j += 1
+    return overlap
+
+
+def parse_minterms(
+    spec: TruthTableSpec, output_string: str, rows: list[int] | None = None
+) -> list[AnswerColumn]:
+    """Build the output columns from sparse minterm notation.
+
+    Each column lists the rows where it is true, e.g. "m(1, 3, 5..7)", optionally
+    followed by the rows that are don't-cares, e.g. "m(1, 3) d(2)". Columns are
+    separated by commas. Only the listed rows are visited, so the cost does not
+    depend on the number of rows that are false. With rows, only those rows of
+    the full table are included, and ranges are never expanded.
+    """
+    num_rows = spec.table_rows
+    terms: list[tuple[list[tuple[int, int]], list[tuple[int, int]]]] = []
+    position = 0
+    for match in re.finditer(SPARSE_TERM_PATTERN, output_string):
+        separator = output_string[position : match.start()].strip()
+        position = match.end()
+        kind, indices = match.groups()
+        if kind == "d":
+            if separator or not terms or terms[-1][1]:
+                raise ValueError('Each "d(...)" must directly follow an "m(...)".')
+            terms[-1][1].extend(_parse_row_ranges(indices, num_rows))
+            continue
+        if separator != ("," if terms else ""):
+            raise ValueError(
+                f'Invalid correct answer near "{separator or match.group(0)}".'
+            )
+        terms.append((_parse_row_ranges(indices, num_rows), []))
+    if output_string[position:].strip():
+        raise ValueError(
+            f'Invalid correct answer near "{output_string[position:].strip()}".'
+        )
+    if len(terms) != spec.num_outputs:
+        raise ValueError(
+            f"The number of output lists ({len(terms)}) must match the number of output names ({spec.num_outputs})."
+        )
+
+    true, false = spec.alphabet[0], spec.alphabet[1]
+    columns = []
+    for ones, dont_cares in terms:
+        ones = _merge_row_ranges(ones)
+        dont_cares = _merge_row_ranges(dont_cares)
+        overlap = _row_range_overlap(ones, dont_cares)
+        if overlap:
+            listed = ", ".join(
+                str(first) if first == last else f"{first}..{last}"
+                for first, last in overlap
+            )
+            raise ValueError(f"Rows [{listed}] cannot be both true and don't-care.")
+        # Disjoint (first, last, value) ranges, in order
+        ranges = sorted(
+            [(first, last, true) for first, last in ones]
+            + [(first, last, DONT_CARE) for first, last in dont_cares]
+        )
+        if rows is not None:
+            firsts = [first for first, _, _ in ranges]
+            values = []
+            for row in rows:
+                index = bisect_right(firsts, row) - 1
+                if index >= 0 and row <= ranges[index][1]:
+                    values.append(ranges[index][2])
+                else:
+                    values.append(false)
+            columns.append(AnswerColumn(1, "".join(values)))
+            continue
+        pieces = []
+        next_row = 0
+        for first, last, value in ranges:
+            pieces.append(false * (first - next_row))
+            pieces.append(value * (last - first + 1))
+            next_row = last + 1
+        pieces.append(false * (num_rows - next_row))
+        columns.append(AnswerColumn(1, "".join(pieces)))
+    return columns
+
+
+def parse_correct_answer(
+    spec: TruthTableSpec, output_string: str, rows: list[int] | None = None
+) -> list[AnswerColumn]:
+    """Split a correct-answer string like "[0, 1, 1, 1], [0, 0, 0, 1]" into columns.
+
+    The string covers the full table; with rows, only those rows are kept.
+    """
+    if output_string.lstrip().startswith("m("):
+        return parse_minterms(spec, output_string, rows)
+
+    columns = scan_correct_answer(spec, output_string)
+    if columns is None:
+        raise ValueError(correct_answer_error(spec, output_string))
+    if rows is not None:
+        columns = [
+            AnswerColumn(column.width, "".join(column.cell(row) for row in rows))
+            for column in columns
+        ]
+    return columns
+
+
+@lru_cache(maxsize=ROWS_CACHE_SIZE)
+def correct_column_pattern(alphabet: str) -> "re.Pattern[str]":
+    """Match the values of one output list and the "],[" (or the end) after it"""
+    return re.compile(rf"([{re.escape(alphabet)},\s]*)(?:\]+\s*,\s*\[+|\]*\s*(\Z))")
+
+
+def scan_correct_answer(
+    spec: TruthTableSpec, output_string: str
+) -> list[AnswerColumn] | None:
+    """Parse a dense correct-answer string in one pass, None if it is not valid.
+
+    A single regular expression match per output list checks its characters,
+    and with whitespace removed every value must be followed by a comma at a
+    fixed stride, which checks the width and number of all values at once.
+    """
+    num_rows = spec.table_rows
+    separators = "," * (num_rows - 1)
+    pattern = correct_column_pattern(spec.alphabet)
+    last = spec.num_outputs - 1
+    columns = []
+    position = re.match(r"\s*\[*", output_string).end()
+    for k in range(spec.num_outputs):
+        match = pattern.match(output_string, position)
+        if match is None or (match.group(2) is None) == (k == last):
+            return None
+        cells = match.group(1).translate(CORRECT_ANSWER_WHITESPACE)
+        width = cells.find(",") if num_rows > 1 else len(cells)
+        if (
+            width < 1
+            or len(cells) != (width + 1) * num_rows - 1
+            or cells.count(",") != num_rows - 1
+            or cells[width :: width + 1] != separators
+        ):
+            return None
+        columns.append(AnswerColumn(width, cells.replace(",", "")))
+        position = match.end()
+    return columns
+
+
+def correct_answer_error(spec: TruthTableSpec, output_string: str) -> str:
+    """Describe the first problem in an invalid correct-answer string and where it is"""
+    alphabet = spec.alphabet
+    num_rows = spec.table_rows
+    column = row = 0
+    width = None
+    opened = True  # the first list may leave out its "["
+    closed = False
+    value_expected = True
+    for match in re.finditer(CORRECT_ANSWER_TOKEN_PATTERN, output_string):
+        token = match.group().translate(CORRECT_ANSWER_WHITESPACE)
+        if not token:
+            continue
+        where = f" (output list {column}, row {row}, character {match.start()})"
+        if token == "[":
+            if row or not value_expected or closed:
+                return f'Unexpected "["{where}.'
+            opened = True
+        elif token == "]":
+            if closed:
+                continue
+            if value_expected:
+                return f"Missing value{where}."
+            if row != num_rows:
+                return f"The length of the correct answer ({row}) must match the number of rows ({num_rows}){where}."
+            closed = True
+        elif token == ",":
+            if closed:
+                column += 1
+                if column == spec.num_outputs:
+                    return f"The number of output lists (more than {column}) must match the number of output names ({spec.num_outputs}){where}."
+                row = 0
+                width = None
+                opened = closed = False
+            elif value_expected:
+                return f"Missing value{where}."
+            value_expected = True
+        else:
+            if closed:
+                return f'Expected "," before "{token}"{where}.'
+            if not opened:
+                return f'Expected "[" before "{token}"{where}.'
+            if not value_expected:
+                return f'Expected "," before "{token}"{where}.'
+            if not set(token).issubset(alphabet):
+                return f'Invalid format. Provided output "{token}" not in alphabet {set(alphabet)}{where}.'
+            if width is None:
+                width = len(token)
+            elif len(token) != width:
+                return f"The bit-width inside correct answer list {column} is not consistent ({len(token)} instead of {width}){where}."
+            if row == num_rows:
+                return f"The length of the correct answer (more than {num_rows}) must match the number of rows ({num_rows}){where}."
+            row += 1
+            value_expected = False
+
+    where = f" (output list {column}, row {row}, character {len(output_string)})"
+    if value_expected:
+        return f"Missing value{where}."
+    if row != num_rows:
+        return f"The length of the correct answer ({row}) must match the number of rows ({num_rows}){where}."
+    if column + 1 != spec.num_outputs:
+        return f"The number of output lists ({column + 1}) must match the number of output names ({spec.num_outputs})."
+    return "Invalid correct answer."
+
+
+def prepare(element_html: str, data: pl.QuestionData) -> None:
+    spec = compile_spec(element_html)
+    profile = start_profile("prepare", spec)
+    name = spec.name
+    pl.check_answers_names(data, name)
+
+    # Get the single correct-answer string from the HTML and split it for each row
+    output_string = None
+    if "correct_answers" in data and name in data["correct_answers"]:
+        output_string = data["correct_answers"][name]
+    else:
+        output_string = spec.correct_answer
+    with profile.step("correct_answers"):
+        rows = choose_sampled_rows(spec, data) if spec.sample_rows else None
+        if isinstance(output_string, dict):
+            # Already packed by an earlier prepare, e.g. of a stored variant
+            columns = packed_correct_columns(spec, output_string)
+        elif output_string is not None:
+            columns = parse_correct_answer(spec, output_string, rows)
+        elif spec.expressions:
+            columns = [
+                AnswerColumn(1, values)
+                for values in evaluate_expressions(
+                    spec.expressions,
+                    spec.input_names,
+                    spec.alphabet,
+                    None if rows is None else tuple(rows),
                 )
-            width = len(output[0])
-            # Split the correct_answer into individual answers for each row
-            for row_index in range(num_rows):
-                if len(output[row_index]) != width:
-                    raise ValueError(
-                        f"The bit-width inside correct answer list {k} is not consistent. Please check."
-                    )
-                data["correct_answers"][f"{name}_{row_index}_{k}"] = output[row_index]
+            ]
+        else:
+            raise ValueError(
+                f'data["correct_answers"][{name}] not declared in server.py. Alternatively, fill out element attribute "correct-answer" or "expression"'
+            )
+
+    with profile.step("store"):
+        store_correct_columns(spec, data, columns)
+    profile.finish(rows=spec.num_rows, cells=spec.num_rows * spec.num_outputs)
 
 
 def _is_read_only(element) -> bool:
@@ -143,147 +995,538 @@ def _is_read_only(element) -> bool:
     )
 
 
-def render(element_html: str, data: pl.QuestionData) -> str:
-    element = lxml.html.fragment_fromstring(element_html)
-    name = pl.get_string_attrib(element, "answers-name")
-    label = pl.get_string_attrib(element, "label", LABEL_DEFAULT)
-    # Get the output name
-    output_name_string = pl.get_string_attrib(
-        element, "output-name"
-    )  # [X or Y, X and Y]
-    output_name = get_headers_as_array(output_name_string)
-    for o_name in output_name:
-        o_name = o_name.lstrip("").rstrip("")
-    num_output = len(output_name)
+def column_format_errors(
+    spec: TruthTableSpec,
+    data: pl.QuestionData,
+    error_kinds: list[dict[int, str]] | None,
+    k: int,
+    start: int,
+    stop: int,
+) -> dict[int, str]:
+    """Format errors of rows start..stop of output column k, by row.
 
-    # Determine if the question is read-only (informational) or requires input.
-    is_material = _is_read_only(element)
-    placeholder = pl.get_string_attrib(element, "placeholder", PLACEHOLDER_DEFAULT)
-    placeholder_l = []
-    for k in range(num_output):
-        placeholder_l.append(
-            placeholder * len(data["correct_answers"][f"{name}_0_{k}"])
+    With aggregate-format-errors these are the kinds of errors, not messages.
+    """
+    if error_kinds is not None:
+        return {
+            i: kind for i, kind in sorted(error_kinds[k].items()) if start <= i < stop
+        }
+    format_errors = data["format_errors"]
+    names = cell_names(spec.name, spec.num_rows, k)
+    return {
+        i: format_errors[names[i]]
+        for i in range(start, stop)
+        if names[i] in format_errors
+    }
+
+
+class OutputColumnView(NamedTuple):
+    """What every cell of an output column shares in the template view"""
+
+    names: tuple[str, ...]
+    answer: AnswerColumn
+    flags: str  # see mask_to_flags, "-" for rows that were not graded
+    submitted: dict[str, Any]
+    default: str
+    placeholder: str
+    width: int
+    # Format errors by cell name, or kinds of errors by row with their messages
+    errors: dict[Any, str]
+    error_messages: dict[str, str] | None = None
+
+    @classmethod
+    def build(
+        cls,
+        spec: TruthTableSpec,
+        data: pl.QuestionData,
+        k: int,
+        answer: AnswerColumn,
+        flags: str,
+        error_kinds: list[dict[int, str]] | None,
+        error_messages: list[dict[str, str]] | None,
+    ) -> "OutputColumnView":
+        """View of column k, with the errors from format_error_kinds if aggregated"""
+        if error_kinds is None:
+            errors = data["format_errors"]
+            messages = None
+        else:
+            errors = error_kinds[k]
+            messages = error_messages[k]
+        return cls(
+            names=cell_names(spec.name, spec.num_rows, k),
+            answer=answer,
+            flags=flags,
+            submitted=data["submitted_answers"],
+            default=spec.prefill * answer.width,
+            placeholder=spec.placeholder * answer.width,
+            width=16 + 8 * (spec.constant_size or answer.width),
+            errors=errors,
+            error_messages=messages,
+        )
+
+
+class TemplateView:
+    """Base of the view objects, which the template reads like dicts.
+
+    chevron subscripts every scope before trying attributes, so a key that is
+    not a field (e.g. one of the table's, further out) fails with one KeyError.
+    """
+
+    __slots__ = ()
+    template_keys: frozenset[str] = frozenset()
+
+    def __getitem__(self, key: str) -> Any:
+        if key not in self.template_keys:
+            raise KeyError(key)
+        return getattr(self, key)
+
+
+class CellView(TemplateView):
+    """One output cell in the template, with its fields looked up on access"""
+
+    __slots__ = ("column", "row")
+    template_keys = frozenset(
+        (
+            "cell_name",
+            "sub",
+            "correct",
+            "incorrect",
+            "input_error",
+            "output_value",
+            "placeholder",
+            "width",
         )
-    prefill = pl.get_string_attrib(element, "prefill", PREFILL_DEFAULT)
-    show_cell_score = pl.get_boolean_attrib(
-        element, "show-cell-score", SHOW_CELL_SCORE_DEFAULT
-    )
-    partial_credit = pl.get_boolean_attrib(
-        element, "partial-credit", PARTIAL_CREDIT_DEFAULT
-    )
-    show_column_score = pl.get_boolean_attrib(
-        element, "show-column-score", SHOW_COLUMN_SCORE_DEFAULT
     )
-    constant_size = int(
-        pl.get_string_attrib(element, "constant-size", CONSTANT_SIZE_DEFAULT)
+
+    def __init__(self, column: OutputColumnView, row: int) -> None:
+        self.column = column
+        self.row = row
+
+    @property
+    def cell_name(self) -> str:
+        return self.column.names[self.row]
+
+    @property
+    def sub(self) -> Any:
+        column = self.column
+        return column.submitted.get(column.names[self.row], column.default)
+
+    @property
+    def correct(self) -> bool:
+        return self.column.flags[self.row] == "1"
+
+    @property
+    def incorrect(self) -> bool:
+        return self.column.flags[self.row] == "0"
+
+    @property
+    def input_error(self) -> str | None:
+        column = self.column
+        if column.error_messages is None:
+            return column.errors.get(column.names[self.row])
+        kind = column.errors.get(self.row)
+        return None if kind is None else column.error_messages[kind]
+
+    @property
+    def output_value(self) -> str:
+        return self.column.answer.cell(self.row)
+
+    @property
+    def placeholder(self) -> str:
+        return self.column.placeholder
+
+    @property
+    def width(self) -> int:
+        return self.column.width
+
+
+class RowView(TemplateView):
+    """One row in the template; its cells are only created while it is rendered"""
+
+    __slots__ = ("columns", "input", "row")
+    template_keys = frozenset(("input", "output"))
+
+    def __init__(
+        self, inputs: tuple[str, ...], columns: tuple[OutputColumnView, ...], row: int
+    ) -> None:
+        self.input = inputs
+        self.columns = columns
+        self.row = row
+
+    @property
+    def output(self) -> tuple[CellView, ...]:
+        return tuple(CellView(column, self.row) for column in self.columns)
+
+
+class TableRowsView(Sequence):
+    """The rows rendered on the server, created one at a time as the template reaches them"""
+
+    __slots__ = ("columns", "inputs")
+
+    def __init__(
+        self,
+        inputs: "list[tuple[str, ...]] | tuple[tuple[str, ...], ...]",
+        columns: tuple[OutputColumnView, ...],
+    ) -> None:
+        self.inputs = inputs
+        self.columns = columns
+
+    def __len__(self) -> int:
+        return len(self.inputs)
+
+    def __getitem__(self, row: int) -> RowView:
+        return RowView(self.inputs[row], self.columns, row)
+
+
+def compact_rows_html(
+    spec: TruthTableSpec,
+    data: pl.QuestionData,
+    answer_columns: list[AnswerColumn],
+    shown_inputs: "list[tuple[str, ...]] | tuple[tuple[str, ...], ...]",
+    shows_values: bool,
+) -> str:
+    """Rows of a compact-render table: bare cells, without per-cell feedback.
+
+    Built directly rather than through the template, since every cell has the
+    same markup; widths come from the table's style and feedback from
+    compact_status_json.
+    """
+    from html import escape
+
+    name = escape(spec.name)
+    submitted = data["submitted_answers"]
+    editable = data["panel"] == "question"
+    defaults = [spec.prefill * answer_column.width for answer_column in answer_columns]
+    parts = []
+    for i, inputs in enumerate(shown_inputs):
+        parts.append("<tr>")
+        parts.extend(
+            f'<td class="input-column">{escape(value)}</td>' for value in inputs
+        )
+        for k, answer_column in enumerate(answer_columns):
+            if shows_values:
+                cell = escape(answer_column.cell(i))
+            else:
+                a_sub = submitted.get(f"{spec.name}_{i}_{k}", defaults[k])
+                # parse stores blank cells as None, which is shown as empty
+                sub = escape("" if a_sub is None else str(a_sub))
+                if editable:
+                    cell = f'<input type="text" name="{name}_{i}_{k}" class="form-control" value="{sub}">'
+                else:
+                    cell = sub
+            parts.append(f'<td class="output-column">{cell}</td>')
+        parts.append("</tr>")
+    return "".join(parts)
+
+
+def compact_status_json(
+    spec: TruthTableSpec,
+    data: pl.QuestionData,
+    answer_columns: list[AnswerColumn],
+    cell_flags: list[str],
+    shown_rows: int,
+) -> str:
+    """Placeholders, correctness and format errors of the rows rendered compactly"""
+    error_kinds = format_error_kinds(spec, data)
+    if error_kinds is not None:
+        widths = [answer_column.width for answer_column in answer_columns]
+        error_messages = format_error_messages(spec, widths)
+    columns = []
+    for k, answer_column in enumerate(answer_columns):
+        column = {
+            "placeholder": spec.placeholder * answer_column.width,
+            "errors": column_format_errors(spec, data, error_kinds, k, 0, shown_rows),
+        }
+        if error_kinds is not None:
+            column["errorMessages"] = error_messages[k]
+        if spec.show_cell_score:
+            column["flags"] = cell_flags[k][:shown_rows]
+        columns.append(column)
+
+    status = {
+        "panel": data["panel"],
+        "numInputs": len(spec.input_names),
+        "numRows": shown_rows,
+        "columns": columns,
+    }
+    return json.dumps(status, separators=(",", ":")).replace("</", "<\\/")
+
+
+def remaining_rows_json(
+    spec: TruthTableSpec,
+    data: pl.QuestionData,
+    answer_columns: list[AnswerColumn],
+    cell_flags: list[str],
+    start: int,
+) -> str:
+    """Describe rows start..num_rows for pl-truth-table.js to render on scroll.
+
+    Input cells are recomputed by the client from the bit widths, so only the
+    output cells are included, and only the parts the panel actually displays.
+    """
+    name = spec.name
+    num_rows = spec.num_rows
+    panel = data["panel"]
+    # Correct answers must not reach the client unless they are displayed
+    shows_values = spec.read_only or panel == "answer"
+    shows_flags = not shows_values and spec.show_cell_score
+    submitted = data["submitted_answers"]
+    error_kinds = format_error_kinds(spec, data)
+    if error_kinds is not None:
+        widths = [answer_column.width for answer_column in answer_columns]
+        error_messages = format_error_messages(spec, widths)
+
+    columns = []
+    for k, answer_column in enumerate(answer_columns):
+        width = answer_column.width
+        column = {
+            "placeholder": spec.placeholder * width,
+            "width": 16 + 8 * (spec.constant_size or width),
+        }
+        if shows_values:
+            column["valueWidth"] = width
+            column["values"] = answer_column.values[start * width :]
+        else:
+            default = spec.prefill * width
+            names = cell_names(name, num_rows, k)[start:]
+            column["sub"] = [submitted.get(cell, default) for cell in names]
+            column["errors"] = column_format_errors(
+                spec, data, error_kinds, k, start, num_rows
+            )
+            if error_kinds is not None:
+                # The client looks up the message of each kind of error
+                column["errorMessages"] = error_messages[k]
+            if shows_flags:
+                column["flags"] = cell_flags[k][start:]
+        columns.append(column)
+
+    description = {
+        "panel": panel,
+        "name": name,
+        "start": start,
+        "numRows": num_rows,
+        "batch": spec.visible_rows,
+        "inputWidths": spec.bit_widths,
+        "alphabet": spec.alphabet,
+        "showValues": shows_values,
+        "columns": columns,
+    }
+    rows = sampled_rows(spec, data)
+    if rows is not None:
+        description["rowIndices"] = rows[start:]
+    # Keep "</script>" inside values from closing the script tag
+    return json.dumps(description, separators=(",", ":")).replace("</", "<\\/")
+
+
+class RenderCache:
+    """Rendered HTML by content digest, in an LRU and optionally in a directory"""
+
+    def __init__(self, max_chars: int, directory: str | None = None) -> None:
+        self.max_chars = max_chars
+        self.directory = directory
+        self.entries: OrderedDict[str, str] = OrderedDict()
+        self.chars = 0
+
+    def _path(self, digest: str) -> str:
+        return os.path.join(self.directory, digest[:2], f"{digest}.html")
+
+    def get(self, digest: str) -> str | None:
+        html = self.entries.get(digest)
+        if html is not None:
+            self.entries.move_to_end(digest)
+            return html
+        if self.directory is None:
+            return None
+        try:
+            with open(self._path(digest), encoding="utf-8") as f:
+                html = f.read()
+        except OSError:
+            return None
+        self._remember(digest, html)
+        return html
+
+    def put(self, digest: str, html: str) -> None:
+        self._remember(digest, html)
+        if self.directory is None:
+            return
+        path = self._path(digest)
+        # Write under a temporary name first, so other workers never read a
+        # partial file; a cache that cannot be written is simply not used
+        try:
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            temp_path = f"{path}.{os.getpid()}.tmp"
+            with open(temp_path, "w", encoding="utf-8") as f:
+                f.write(html)
+            os.replace(temp_path, path)
+        except OSError:
+            pass
+
+    def clear(self) -> None:
+        """Forget the HTML kept in memory; files in the directory are kept"""
+        self.entries.clear()
+        self.chars = 0
+
+    def _remember(self, digest: str, html: str) -> None:
+        if len(html) > self.max_chars:
+            return
+        if digest in self.entries:
+            self.chars -= len(self.entries.pop(digest))
+        self.entries[digest] = html
+        self.chars += len(html)
+        while self.chars > self.max_chars:
+            _, evicted = self.entries.popitem(last=False)
+            self.chars -= len(evicted)
+
+
+_render_cache = RenderCache(
+    RENDER_CACHE_MAX_CHARS, os.environ.get(RENDER_CACHE_ENV_VAR) or None
+)
+# Cached HTML from an older version of this file must not be reused
+_CONTROLLER_MTIME = os.stat(__file__).st_mtime_ns
+
+
+def render_digest(
+    element_html: str,
+    panel: str,
+    answer_columns: list[AnswerColumn],
+    rows: list[int] | None = None,
+) -> str:
+    """Digest of everything the answer panel and read-only tables depend on"""
+    import hashlib
+
+    template_mtime = os.stat(TRUTH_TABLE_MUSTACHE_TEMPLATE_NAME).st_mtime_ns
+    digest = hashlib.sha256()
+    header = [_CONTROLLER_MTIME, template_mtime, element_html, panel, rows]
+    header.append([answer_column.width for answer_column in answer_columns])
+    digest.update(json.dumps(header).encode())
+    for answer_column in answer_columns:
+        digest.update(b"\0" + answer_column.values.encode())
+    return digest.hexdigest()
+
+
+class TableModel(NamedTuple):
+    """What the question, submission and answer panels of a submission all show
+
+    Built only from the element, its correct answers and sampled rows, the
+    score summary and the aggregated format errors of the table. It never
+    reads submitted_answers, which table_model_key relies on.
+    """
+
+    shown_inputs: "list[tuple[str, ...]] | tuple[tuple[str, ...], ...]"
+    cell_flags: list[str]  # see mask_to_flags, "-" for rows that were not graded
+    column_data: list[dict[str, Any]]
+    col_percentage_updated: bool
+    # The percentage of the last column once column_data is built, as always shown
+    score: float | None
+    all_correct: bool
+    all_incorrect: bool
+    error_kinds: list[dict[int, str]] | None
+    error_messages: list[dict[str, str]] | None
+
+
+# Keyed by table_model_key, so the panels of one submission share their model
+_table_models: OrderedDict[tuple[Any, ...], TableModel] = OrderedDict()
+
+
+def table_model_key(
+    spec: TruthTableSpec,
+    data: pl.QuestionData,
+    answer_columns: list[AnswerColumn],
+    rows: list[int] | None,
+) -> tuple[Any, ...] | None:
+    """The state a table model is built from, None if it is not worth caching"""
+    # Without a score summary every cell score would have to be part of the key,
+    # which costs as much as building the model
+    summary = data["partial_scores"].get(spec.name, {})
+    if "correct_cells" not in summary:
+        return None
+    errors = data["format_errors"].get(spec.name)
+    return (
+        spec,
+        tuple(answer_columns),
+        None if rows is None else tuple(rows),
+        summary.get("score"),
+        tuple(summary["column_correct"]),
+        tuple(summary["correct_cells"]),
+        json.dumps(errors) if isinstance(errors, dict) else None,
     )
 
+
+def build_table_model(
+    spec: TruthTableSpec,
+    data: pl.QuestionData,
+    answer_columns: list[AnswerColumn],
+    profile: "PhaseProfile | _DisabledProfile",
+) -> TableModel:
+    """Scores, format errors and shown rows of a submission, see table_model"""
+    name = spec.name
+    output_name = list(spec.output_names)
+    num_output = spec.num_outputs
+    num_rows = spec.num_rows
+
     score = data["partial_scores"].get(name, {"score": None}).get("score", None)
     if score is not None:
         score = float(score) * 100
     ac = score == 100
     aw = score == 0
 
-    # prepare the input variables e.g. ['X', 'Y']
-    variable_string = pl.get_string_attrib(element, "input-name")
-    variables = get_headers_as_array(variable_string)
-
-    # Generate table data
-    var_lenth = len(variables)
-    # check if different bitwidth is provided for each variable
-    bit_width = pl.get_string_attrib(element, "bit-width", BIT_WIDTH_DEFAULT)
-    num_rows = 1
-    if "," in bit_width:
-        bit_width_list = bit_width.lstrip("[").rstrip("]").split(",")
-        for x in bit_width_list:
-            num_rows *= 2 ** int(x)
-    else:
-        num_rows = (
-            2 ** (int(bit_width) * var_lenth)
-        )  # Total rows in the truth table based on the number of variables and bit width
-    columns = [{"name": c} for c in variables]
-    rows = []
-    for i in range(num_rows):
-        row = {
-            "input": [],
-            "row_index": i,
-            "name": name,
-            "is_first_row": i == 0,
-            "output": [],
-        }
-        if "," in bit_width:
-            max_values = [2 ** int(w) for w in bit_width_list]
-            counts = []
-            rem = i
-            # Convert the count into counts for each bitwidth
-            for mv in reversed(max_values):
-                counts.append(rem % mv)
-                rem //= mv
-            counts.reverse()
-            # Generate the binary strings for the current counts
-            row["input"] = [
-                format(counts[i], f"0{int(bit_width_list[i])}b")
-                for i in range(len(bit_width_list))
-            ]
-        else:
-            for j in range(var_lenth):
-                # Calculate the bit position for the j-th variable
-                bit_position = (var_lenth - j - 1) * int(bit_width)
-                # Extract bit_width bits for the j-th variable from the row index
-                # Shift right to bring the desired bits to the least significant position
-                # Then apply a mask to extract exactly k bits
-                bits = (i >> bit_position) & ((1 << int(bit_width)) - 1)
-                # Format the bits as a binary string with leading zeros to ensure k bits
-                bit_str = format(bits, f"0{bit_width}b")
-                row["input"].append(bit_str)
-        alphabet = pl.get_string_attrib(element, "alphabet", ALPHABET_DEFAULT)
-        row["input"] = [i.replace("1", alphabet[0]) for i in row["input"]]
-        row["input"] = [i.replace("0", alphabet[1]) for i in row["input"]]
-        for k in range(num_output):
-            size = constant_size or len(data["correct_answers"][f"{name}_0_{k}"])
-            output = {
-                "cell_name": f"{name}_{i}_{k}",
-                "output_index": k,
-                "sub": data["submitted_answers"].get(
-                    f"{name}_{i}_{k}",
-                    prefill * len(data["correct_answers"][f"{name}_{i}_{k}"]),
-                ),
-                "correct": False,
-                "incorrect": False,
-                "input_error": data["format_errors"].get(f"{name}_{i}_{k}", None),
-                "output_value": data["correct_answers"].get(
-                    f"{name}_{i}_{k}", CORRECT_ANSWER_DEFAULT
-                ),
-                "placeholder": placeholder_l[k],
-                "width": 16 + 8 * size,
-            }
-            row["output"].append(output)
-        rows.append(row)
-
     col_percentage_updated = False
     # stores column accuracies
     column_data = []
     raw_column_scores = [0.0] * num_output
+    # One flag per row and column: "1" correct, "0" incorrect, "-" not graded
+    with profile.step("scores"):
+        summary = data["partial_scores"].get(name, {})
+        if "correct_cells" in summary:
+            # Graded with column summaries, so no per-cell lookups are needed
+            col_percentage_updated = True
+            raw_column_scores = summary["column_correct"]
+            cell_flags = [
+                mask_to_flags(int(correct_cells, 16), num_rows)
+                for correct_cells in summary["correct_cells"]
+            ]
+        else:
+            cell_flags = []
+            for k in range(num_output):
+                flags = []
+                for index in range(num_rows):
+                    answer_name = f"{name}_{index}_{k}"
+                    partial_score = (
+                        data["partial_scores"]
+                        .get(answer_name, {"score": None})
+                        .get("score", None)
+                    )
+                    if partial_score is None:
+                        flags.append("-")
+                        continue
+                    try:
+                        col_percentage_updated = True
+                        partial_score = float(partial_score)
+                        if partial_score >= 1:
+                            flags.append("1")
+                            raw_column_scores[k] += 1
+                        else:
+                            flags.append("0")
+                    except Exception as e:
+                        raise ValueError("invalid score" + partial_score) from e
+                cell_flags.append("".join(flags))
 
-    for index in range(num_rows):
-        for k in range(num_output):
-            answer_name = f"{name}_{index}_{k}"
-            partial_score = (
-                data["partial_scores"]
-                .get(answer_name, {"score": None})
-                .get("score", None)
-            )
-            if partial_score is not None:
-                try:
-                    col_percentage_updated = True
-                    partial_score = float(partial_score)
-                    if partial_score >= 1:
-                        rows[index]["output"][k]["correct"] = True
-                        raw_column_scores[k] += 1
-                    else:
-                        rows[index]["output"][k]["incorrect"] = True
-                except Exception as e:
-                    raise ValueError("invalid score" + partial_score) from e
+    # With aggregate-format-errors, messages are only looked up for shown rows
+    error_kinds = format_error_kinds(spec, data)
+    error_messages = None
+    if error_kinds is not None:
+        error_messages = format_error_messages(
+            spec, [answer_column.width for answer_column in answer_columns]
+        )
+
+    shown_rows = min(spec.visible_rows or num_rows, num_rows)
+    sampled = sampled_rows(spec, data)
+    if sampled is None:
+        shown_inputs = input_rows(spec.bit_widths, spec.alphabet)[:shown_rows]
+    else:
+        shown_inputs = sampled_input_rows(
+            spec.bit_widths, spec.alphabet, sampled[:shown_rows]
+        )
 
     try:
         for i in range(len(raw_column_scores)):
@@ -298,251 +1541,554 @@ def render(element_html: str, data: pl.QuestionData) -> str:
     except Exception as e:
         raise ValueError("invalid column scores - " + raw_column_scores) from e
 
-    # Get template
-    with open(TRUTH_TABLE_MUSTACHE_TEMPLATE_NAME, "r", encoding="utf-8") as f:
-        template = f.read()
-    if data["panel"] == "question":
-        grading_text = ""
-        if partial_credit:
-            if show_cell_score:
-                grading_text = "You will receive partial credit per correct cell, and feedback which cells are filled out correctly"
-            elif show_column_score:
-                grading_text = "You will receive partial credit per correct cell, and feedback to which degree each column is filled out correctly"
-            else:
-                grading_text = "You will receive partial credit per correct cell, but no feedback which cells are filled out correctly"
+    return TableModel(
+        shown_inputs=shown_inputs,
+        cell_flags=cell_flags,
+        column_data=column_data,
+        col_percentage_updated=col_percentage_updated,
+        score=score,
+        all_correct=ac,
+        all_incorrect=aw,
+        error_kinds=error_kinds,
+        error_messages=error_messages,
+    )
+
+
+def mark_unsubmitted_cells(spec: TruthTableSpec, data: pl.QuestionData) -> None:
+    """Give cells missing from submitted_answers a "No submitted answer." error"""
+    submitted = data["submitted_answers"]
+    format_errors = data["format_errors"]
+    for index in range(spec.num_rows):
+        for k in range(spec.num_outputs):
+            answer_name = f"{spec.name}_{index}_{k}"
+            if answer_name not in submitted:
+                format_errors[answer_name] = "No submitted answer."
+            elif (
+                submitted[answer_name] is None
+                and format_errors.get(answer_name) is None
+            ):
+                raise Exception("submitted answer is None")
+
+
+def table_model(
+    spec: TruthTableSpec,
+    data: pl.QuestionData,
+    answer_columns: list[AnswerColumn],
+    profile: "PhaseProfile | _DisabledProfile",
+) -> TableModel:
+    """The table model of a submission, built once for all of its panels"""
+    key = table_model_key(spec, data, answer_columns, sampled_rows(spec, data))
+    if key is None:
+        return build_table_model(spec, data, answer_columns, profile)
+    model = _table_models.get(key)
+    if model is None:
+        model = build_table_model(spec, data, answer_columns, profile)
+        _table_models[key] = model
+    _table_models.move_to_end(key)
+    while len(_table_models) > MODEL_CACHE_SIZE:
+        _table_models.popitem(last=False)
+    return model
+
+
+def render(element_html: str, data: pl.QuestionData) -> str:
+    spec = compile_spec(element_html)
+    profile = start_profile("render", spec)
+    name = spec.name
+    label = spec.label
+    output_name = list(spec.output_names)
+    num_output = spec.num_outputs
+
+    # Determine if the question is read-only (informational) or requires input.
+    is_material = spec.read_only
+    answer_columns = get_correct_columns(spec, data)
+
+    # These show only the correct answers, the same for every student of a variant
+    digest = None
+    if is_material or data["panel"] == "answer":
+        digest = render_digest(
+            element_html, data["panel"], answer_columns, sampled_rows(spec, data)
+        )
+        html = _render_cache.get(digest)
+        if html is not None:
+            profile.finish(cached=1)
+            return html
+
+    show_cell_score = spec.show_cell_score
+    partial_credit = spec.partial_credit
+    show_column_score = spec.show_column_score
+    constant_size = spec.constant_size
+    num_rows = spec.num_rows
+
+    model = table_model(spec, data, answer_columns, profile)
+    score = model.score
+    column_data = model.column_data
+    cell_flags = model.cell_flags
+    error_kinds = model.error_kinds
+    error_messages = model.error_messages
+
+    # Generate table data, only for the rows that are rendered on the server
+    with profile.step("rows"):
+        shown_rows = len(model.shown_inputs)
+        shown_inputs = model.shown_inputs
+        columns = [{"name": c} for c in spec.input_names]
+        rows = []
+        compact_rows = None
+        if spec.compact_render:
+            compact_rows = compact_rows_html(
+                spec,
+                data,
+                answer_columns,
+                shown_inputs,
+                is_material or data["panel"] == "answer",
+            )
         else:
-            if show_cell_score:
-                grading_text = "You will not receive partial credit unless the entire table is filled correctly, but feedback on which cells are correct."
-            elif show_column_score:
-                grading_text = "You will not receive partial credit unless the entire table is filled correctly, but feedback to which degree each column is filled out correctly."
+            views = tuple(
+                OutputColumnView.build(
+                    spec,
+                    data,
+                    k,
+                    answer_column,
+                    cell_flags[k],
+                    error_kinds,
+                    error_messages,
+                )
+                for k, answer_column in enumerate(answer_columns)
+            )
+            rows = TableRowsView(shown_inputs, views)
+
+        # The client renders the remaining rows on scroll from a compact description
+        more_rows = None
+        if shown_rows < num_rows:
+            more_rows = remaining_rows_json(
+                spec, data, answer_columns, cell_flags, shown_rows
+            )
+        compact_status = None
+        if spec.compact_render and not is_material and data["panel"] != "answer":
+            compact_status = compact_status_json(
+                spec, data, answer_columns, cell_flags, shown_rows
+            )
+
+    import chevron
+
+    template = get_template_sections()
+    html = ""
+    with profile.step("template"):
+        if data["panel"] == "question":
+            grading_text = ""
+            if partial_credit:
+                if show_cell_score:
+                    grading_text = "You will receive partial credit per correct cell, and feedback which cells are filled out correctly"
+                elif show_column_score:
+                    grading_text = "You will receive partial credit per correct cell, and feedback to which degree each column is filled out correctly"
+                else:
+                    grading_text = "You will receive partial credit per correct cell, but no feedback which cells are filled out correctly"
             else:
-                grading_text = "You will not receive partial credit or feedback unless the entire table is filled correctly."
-
-        info_params = {
-            "format": True,
-            "bitwidth": bit_width,
-            "grading_text": grading_text,
-            "alphabet": ", ".join(
-                set(pl.get_string_attrib(element, "alphabet", ALPHABET_DEFAULT))
-            ),
-        }
-        info = chevron.render(template, info_params).strip()
-        html_params = {
-            "question": True,
-            "name": name,
-            "output_name": output_name,
-            "label": label,
-            "info": info,
-            "uuid": pl.get_uuid(),
-            "columns": columns,
-            "rows": rows,
-            "num_rows": num_rows,
-            "is_material": is_material,
-            "show_cell_score": show_cell_score,
-            "show_column_score": show_column_score,
-            "column_data": column_data,
-            "col_percentage_updated": col_percentage_updated,
-            "score": score,
-            "all_correct": ac,
-            "all_incorrect": aw,
-        }
-        return chevron.render(template, html_params).strip()
-    elif data["panel"] == "submission":
-        html_params = {
-            "submission": True,
-            "name": name,
-            "output_name": output_name,
-            "label": label,
-            "uuid": pl.get_uuid(),
-            "columns": columns,
-            "rows": rows,
-            "num_rows": num_rows,
-            "is_material": is_material,
-            "show_cell_score": show_cell_score,
-            "show_column_score": show_column_score,
-            "column_data": column_data,
-            "col_percentage_updated": col_percentage_updated,
-            "score": score,
-            "all_correct": ac,
-            "all_incorrect": aw,
-        }
-        for index in range(num_rows):
-            for k in range(num_output):
-                # Construct the indexed name (e.g., answers-name_0, answers-name_1, ...)
-                answer_name = f"{name}_{index}_{k}"
-                parse_error = data["format_errors"].get(answer_name, None)
-                if parse_error is None and answer_name in data["submitted_answers"]:
-                    # Get submitted answer, raising an exception if it does not exist
-                    a_sub = data["submitted_answers"].get(answer_name, None)
-                    if a_sub is None:
-                        raise Exception("submitted answer is None")
-                    # If answer is in a format generated by pl.to_json, convert it
-                    # back to a standard type (otherwise, do nothing)
-                    a_sub = pl.from_json(a_sub)
-                    a_sub = pl.escape_unicode_string(a_sub)
-                    html_params["a_sub"] = a_sub
-                elif answer_name not in data["submitted_answers"]:
-                    data["format_errors"][answer_name] = "No submitted answer."
-                    html_params["parse_error"] = None
-        if partial_credit and score is not None:
-            score_type, score_value = pl.determine_score_params(score)
-            html_params[score_type] = score_value
-        return chevron.render(template, html_params).strip()
-    elif data["panel"] == "answer":
-        html_params = {
-            "answer": True,
-            "name": name,
-            "output_name": output_name,
-            "label": label,
-            "columns": columns,
-            "rows": rows,
+                if show_cell_score:
+                    grading_text = "You will not receive partial credit unless the entire table is filled correctly, but feedback on which cells are correct."
+                elif show_column_score:
+                    grading_text = "You will not receive partial credit unless the entire table is filled correctly, but feedback to which degree each column is filled out correctly."
+                else:
+                    grading_text = "You will not receive partial credit or feedback unless the entire table is filled correctly."
+
+            info_params = {
+                "format": True,
+                "bitwidth": spec.bit_width,
+                "grading_text": grading_text,
+                "alphabet": ", ".join(set(spec.alphabet)),
+            }
+            info = chevron.render(template["format"], info_params).strip()
+            uuid = pl.get_uuid()
+            validation_schema = None
+            if spec.client_validation and not is_material:
+                validation_schema = validation_schema_json(
+                    spec, [answer_column.width for answer_column in answer_columns]
+                )
+            compact_style = None
+            if compact_rows is not None and not is_material:
+                # One width per output column instead of a style on every input
+                compact_style = "".join(
+                    f"#truth-table-{uuid} td:nth-child({len(columns) + k + 1}) .form-control"
+                    f"{{width:{16 + 8 * (constant_size or answer_column.width)}px}}"
+                    for k, answer_column in enumerate(answer_columns)
+                )
+            html_params = {
+                "question": True,
+                "name": name,
+                "output_name": output_name,
+                "label": label,
+                "info": info,
+                "uuid": uuid,
+                "columns": columns,
+                "rows": rows,
+                "num_rows": num_rows,
+                "is_material": is_material,
+                "show_cell_score": show_cell_score,
+                "show_column_score": show_column_score,
+                "column_data": column_data,
+                "col_percentage_updated": model.col_percentage_updated,
+                "score": score,
+                "all_correct": model.all_correct,
+                "all_incorrect": model.all_incorrect,
+                "more_rows": more_rows,
+                "packed_submission": spec.packed_submission and not is_material,
+                "num_outputs": num_output,
+                "compact_rows": compact_rows,
+                "compact_style": compact_style,
+                "compact_status": compact_status,
+                "validation_schema": validation_schema,
+            }
+            html = chevron.render(template["question"], html_params).strip()
+        elif data["panel"] == "submission":
+            html_params = {
+                "submission": True,
+                "name": name,
+                "output_name": output_name,
+                "label": label,
+                "uuid": pl.get_uuid(),
+                "columns": columns,
+                "rows": rows,
+                "num_rows": num_rows,
+                "is_material": is_material,
+                "show_cell_score": show_cell_score,
+                "show_column_score": show_column_score,
+                "column_data": column_data,
+                "col_percentage_updated": model.col_percentage_updated,
+                "score": score,
+                "all_correct": model.all_correct,
+                "all_incorrect": model.all_incorrect,
+                "more_rows": more_rows,
+                "compact_rows": compact_rows,
+                "compact_status": compact_status,
+            }
+            # Cells that were never submitted are shown as such, unless format
+            # errors were aggregated, as those are already summarized by parse
+            if error_kinds is None:
+                mark_unsubmitted_cells(spec, data)
+            if partial_credit and score is not None:
+                score_type, score_value = pl.determine_score_params(score)
+                html_params[score_type] = score_value
+            html = chevron.render(template["submission"], html_params).strip()
+        elif data["panel"] == "answer":
+            html_params = {
+                "answer": True,
+                "name": name,
+                "output_name": output_name,
+                "label": label,
+                "columns": columns,
+                "rows": rows,
+                "more_rows": more_rows,
+                "compact_rows": compact_rows,
+            }
+            html = chevron.render(template["answer"], html_params).strip()
+
+    if digest is not None:
+        _render_cache.put(digest, html)
+    profile.finish(
+        rows=shown_rows,
+        cells=shown_rows * num_output,
+        html_bytes=len(html.encode()) if profile.enabled else 0,
+        cached=0,
+    )
+    return html
+
+
+def format_error_messages(
+    spec: TruthTableSpec, widths: list[int]
+) -> list[dict[str, str]]:
+    """Message of each kind of format error, per output column"""
+    alphabet_error = (
+        f"Invalid format. Input not in alphabet ({','.join(set(spec.alphabet))})."
+    )
+    return [
+        {
+            "missing": "No submitted answer.",
+            "blank": "Invalid format. The submitted answer was left blank.",
+            "length": f"Invalid format. The submitted answer must be {width} bit(s) long.",
+            "alphabet": alphabet_error,
         }
-        return chevron.render(template, html_params).strip()
+        for width in widths
+    ]
 
 
-def parse(element_html: str, data: pl.QuestionData) -> None:
-    element = lxml.html.fragment_fromstring(element_html)
-    name = pl.get_string_attrib(element, "answers-name")
-    # Get the output name
-    output_name_string = pl.get_string_attrib(
-        element, "output-name"
-    )  # [X or Y, X and Y]
-    output_name = get_headers_as_array(output_name_string)
-    for o_name in output_name:
-        o_name = o_name.lstrip("").rstrip("")
-    num_output = len(output_name)
-
-    # Check if the question is marked as material (informational)
-    is_material = _is_read_only(element)
-    # If it's material, skip grading
-    if is_material:
-        return
+def validation_schema_json(spec: TruthTableSpec, widths: list[int]) -> str:
+    """Rules of cell_format_error for pl-truth-table.js to check before posting"""
+    # constant-size keeps the expected widths hidden until an answer is graded
+    kinds = (
+        ("blank", "alphabet") if spec.constant_size else ("blank", "length", "alphabet")
+    )
+    schema = {
+        "name": spec.name,
+        "numRows": spec.num_rows,
+        "alphabet": spec.alphabet.lower(),
+        "widths": None if spec.constant_size else widths,
+        "messages": [
+            {kind: messages[kind] for kind in kinds}
+            for messages in format_error_messages(spec, widths)
+        ],
+    }
+    return json.dumps(schema, separators=(",", ":")).replace("</", "<\\/")
 
-    # prepare the input variables e.g. ['X', 'Y']
-    variable_string = pl.get_string_attrib(element, "input-name")
-    variables = get_headers_as_array(variable_string)
 
-    # check if different bitwidth is provided for each variable
-    bit_width = pl.get_string_attrib(element, "bit-width", BIT_WIDTH_DEFAULT)
-    num_rows = 1
-    if "," in bit_width:
-        bit_width_l = bit_width.lstrip("[").rstrip("]").split(",")
-        for x in bit_width_l:
-            num_rows *= 2 ** int(x)
-    else:
-        num_rows = (
-            2 ** (int(bit_width) * len(variables))
-        )  # Total rows in the truth table based on the number of variables and bit width
+def cell_format_error(
+    a_sub: str | None, expected_len: int, alphabet: str
+) -> str | None:
+    """Kind of format error of a cell, or None; alphabet must be lower case"""
+    if a_sub is None:
+        return "missing"
+    if not a_sub:
+        return "blank"
+    if len(a_sub) != expected_len:
+        return "length"
+    # Nothing is left after stripping exactly if every character is in the alphabet
+    if a_sub.lower().strip(alphabet):
+        return "alphabet"
+    return None
+
+
+def unpack_submission(packed: Any) -> list[str | None] | None:
+    """Cells of a packed submission in row-major order, or None if it is malformed"""
+    try:
+        cells = json.loads(packed)
+    except (TypeError, ValueError):
+        return None
+    if not isinstance(cells, list):
+        return None
+    if not all(cell is None or isinstance(cell, str) for cell in cells):
+        return None
+    return cells
 
-    alphabet = pl.get_string_attrib(element, "alphabet", ALPHABET_DEFAULT)
+
+def parse_packed_submission(
+    spec: TruthTableSpec,
+    data: pl.QuestionData,
+    widths: list[int],
+    cells: list[str | None],
+) -> list[tuple[int, int, str]]:
+    """Validate the single field posted by the element script in one pass.
+
+    Returns the row, output column and kind of every format error.
+    """
+    name = spec.name
+    submitted = data["submitted_answers"]
+    alphabet = spec.alphabet.lower()
+    errors = []
+
+    num_output = spec.num_outputs
+    num_cells = spec.num_rows * num_output
+    # Cells missing from the end of the list are treated as not submitted
+    cells = cells[:num_cells] + [None] * (num_cells - len(cells))
+    for index, a_sub in enumerate(cells):
+        row_index, k = divmod(index, num_output)
+        error = cell_format_error(a_sub, widths[k], alphabet)
+        if error is not None:
+            errors.append((row_index, k, error))
+        # Plain strings are stored as they are, without pl.to_json
+        submitted[f"{name}_{row_index}_{k}"] = a_sub or None
+    return errors
+
+
+def parse_cell_fields(
+    spec: TruthTableSpec, data: pl.QuestionData, widths: list[int]
+) -> list[tuple[int, int, str]]:
+    """Validate the submission when every cell was posted as its own field"""
+    name = spec.name
+    alphabet = spec.alphabet.lower()
+    errors = []
 
     # Loop through each row to capture submitted answers
-    for row_index in range(num_rows):
-        for k in range(num_output):
+    for row_index in range(spec.num_rows):
+        for k in range(spec.num_outputs):
             answer_name = f"{name}_{row_index}_{k}"
             a_sub = data["submitted_answers"].get(answer_name, None)
-            expected_len = len(data["correct_answers"][answer_name])
-            if a_sub is None:
-                data["format_errors"][answer_name] = "No submitted answer."
-                data["submitted_answers"][answer_name] = None
-                continue
+            error = cell_format_error(a_sub, widths[k], alphabet)
+            if error is not None:
+                errors.append((row_index, k, error))
             if not a_sub:
-                data["format_errors"][answer_name] = (
-                    "Invalid format. The submitted answer was left blank."
-                )
                 data["submitted_answers"][answer_name] = None
-            elif len(a_sub) != expected_len:
-                data["format_errors"][answer_name] = (
-                    f"Invalid format. The submitted answer must be {expected_len} bit(s) long."
-                )
-                data["submitted_answers"][answer_name] = pl.to_json(a_sub)
-            elif not set(a_sub.lower()).issubset(set(alphabet.lower())):
-                alphabet_print = ",".join(set(alphabet))
-                data["format_errors"][answer_name] = (
-                    f"Invalid format. Input not in alphabet ({alphabet_print})."
-                )
-                data["submitted_answers"][answer_name] = pl.to_json(a_sub)
             else:
                 # Store the submitted answer for this row
                 data["submitted_answers"][answer_name] = pl.to_json(a_sub)
+    return errors
 
 
-def grade(element_html: str, data: pl.QuestionData) -> None:
-    element = lxml.html.fragment_fromstring(element_html)
+def store_format_errors(
+    spec: TruthTableSpec,
+    data: pl.QuestionData,
+    widths: list[int],
+    errors: list[tuple[int, int, str]],
+    table_error: str | None = None,
+) -> None:
+    """Save format errors per cell, or as one summary per element.
+
+    The summary counts the errors of each kind and marks the affected cells in
+    one hex bitset per kind and column (bit i is row i); render turns these back
+    into messages for the rows it shows.
+    """
+    name = spec.name
+    format_errors = data["format_errors"]
+    if not spec.aggregate_format_errors:
+        if table_error is not None:
+            format_errors[name] = table_error
+        messages = format_error_messages(spec, widths)
+        for row_index, k, kind in errors:
+            format_errors[f"{name}_{row_index}_{k}"] = messages[k][kind]
+        return
+    if not errors and table_error is None:
+        return
+
+    counts: dict[str, int] = {}
+    flags: dict[str, list[bytearray]] = {}
+    for row_index, k, kind in errors:
+        if kind not in flags:
+            flags[kind] = [bytearray(b"0" * spec.num_rows) for _ in widths]
+            counts[kind] = 0
+        flags[kind][k][row_index] = ord("1")
+        counts[kind] += 1
+    num_cells = spec.num_rows * spec.num_outputs
+    format_errors[name] = {
+        "message": table_error
+        or f"Invalid format. {len(errors)} of {num_cells} cells are not valid.",
+        "counts": counts,
+        "cells": {
+            kind: [format(int(column[::-1], 2), "x") for column in columns]
+            for kind, columns in flags.items()
+        },
+    }
+
 
-    # Check if the question is marked as material (informational)
-    is_material = _is_read_only(element)
+def format_error_kinds(
+    spec: TruthTableSpec, data: pl.QuestionData
+) -> list[dict[int, str]] | None:
+    """Kind of format error by row, per column, if errors were aggregated"""
+    summary = data["format_errors"].get(spec.name)
+    if not isinstance(summary, dict):
+        return None
+    kinds: list[dict[int, str]] = [{} for _ in range(spec.num_outputs)]
+    for kind, columns in summary["cells"].items():
+        for k, cells in enumerate(columns):
+            flags = mask_to_flags(int(cells, 16), spec.num_rows)
+            row_index = flags.find("1")
+            while row_index != -1:
+                kinds[k][row_index] = kind
+                row_index = flags.find("1", row_index + 1)
+    return kinds
+
+
+def parse(element_html: str, data: pl.QuestionData) -> None:
+    spec = compile_spec(element_html)
     # If it's material, skip grading
-    if is_material:
+    if spec.read_only:
         return
 
-    name = pl.get_string_attrib(element, "answers-name")
-    # prepare the input variables e.g. ['X', 'Y']
-    variable_string = pl.get_string_attrib(element, "input-name")
-    variables = get_headers_as_array(variable_string)
-    # check if different bitwidth is provided for each variable
-    bit_width = pl.get_string_attrib(element, "bit-width", BIT_WIDTH_DEFAULT)
-    num_rows = 1
-    if "," in bit_width:
-        bit_width = bit_width.lstrip("[").rstrip("]").split(",")
-        for x in bit_width:
-            num_rows *= 2 ** int(x)
-    else:
-        num_rows = (
-            2 ** (int(bit_width) * len(variables))
-        )  # Total rows in the truth table based on the number of variables and bit width
-    # Get the output name
-    output_name = pl.get_string_attrib(element, "output-name")  # [X or Y, X and Y]
-    output_name = get_headers_as_array(output_name)
-    for o_name in output_name:
-        o_name = o_name.lstrip("").rstrip("")
-    num_output = len(output_name)
-
-    partial_credit = pl.get_boolean_attrib(
-        element, "partial-credit", PARTIAL_CREDIT_DEFAULT
+    profile = start_profile("parse", spec)
+    answer_columns = get_correct_columns(spec, data)
+    widths = [answer_column.width for answer_column in answer_columns]
+
+    with profile.step("validate"):
+        table_error = None
+        # Without the element script, every cell is still posted as its own field
+        if spec.packed_submission and spec.name in data["submitted_answers"]:
+            cells = unpack_submission(data["submitted_answers"].pop(spec.name))
+            if cells is None:
+                table_error = "Invalid format. The submitted table could not be read."
+                cells = []
+            errors = parse_packed_submission(spec, data, widths, cells)
+        else:
+            errors = parse_cell_fields(spec, data, widths)
+        store_format_errors(spec, data, widths, errors, table_error)
+
+    num_cells = spec.num_rows * spec.num_outputs
+    profile.finish(
+        rows=spec.num_rows,
+        cells=num_cells,
+        format_errors=len(errors),
     )
 
-    is_incorrect = False
-    score_sum = 0
-    for index in range(num_rows):
-        for k in range(num_output):
-            answer_name = f"{name}_{index}_{k}"
-            # Get the correct answer for each row
-            a_tru = pl.from_json(data["correct_answers"].get(answer_name, None))
-            if a_tru is None:
-                break
-            if answer_name in data["submitted_answers"]:
-                a_sub = pl.from_json(data["submitted_answers"][answer_name])
-                if a_sub.lower() == a_tru.lower():
-                    data["partial_scores"][answer_name] = {
-                        "score": 1,
-                        "feedback": "Correct.",
-                    }
-                    score_sum += 1
-                else:
-                    data["partial_scores"][answer_name] = {
-                        "score": 0,
-                        "feedback": "Incorrect.",
-                    }
-                    if not partial_credit:
-                        is_incorrect = True
-            else:
-                data["partial_scores"][answer_name] = {
-                    "score": 0,
-                    "feedback": "Missing input.",
-                }
-                if not partial_credit:
-                    is_incorrect = True
-
-    if not partial_credit and is_incorrect:
-        # assign the score to all the answers
+
+def grade(element_html: str, data: pl.QuestionData) -> None:
+    spec = compile_spec(element_html)
+    # If it's material, skip grading
+    if spec.read_only:
+        return
+
+    name = spec.name
+    num_output = spec.num_outputs
+    num_rows = spec.num_rows
+    partial_credit = spec.partial_credit
+
+    profile = start_profile("grade", spec)
+    answer_columns = get_correct_columns(spec, data)
+    submitted = data["submitted_answers"]
+
+    # Compare whole columns at once; bit i of a mask is set if row i is correct
+    with profile.step("compare"):
+        cell_subs = []
+        correct_masks = []
+        for k, answer_column in enumerate(answer_columns):
+            subs = [
+                submitted.get(answer_name)
+                for answer_name in cell_names(name, num_rows, k)
+            ]
+            cell_subs.append(subs)
+            correct_masks.append(match_mask(subs, answer_column))
+
+    column_correct = [mask.bit_count() for mask in correct_masks]
+    score_sum = sum(column_correct)
+    # Without partial credit, any mistake voids the whole table
+    all_or_nothing_failed = not partial_credit and score_sum < num_rows * num_output
+    if all_or_nothing_failed:
         score_sum = 0
-        for index in range(num_rows):
-            for k in range(num_output):
-                answer_name = f"{name}_{index}_{k}"
-                a_tru = pl.from_json(data["correct_answers"].get(answer_name, None))
-                if a_tru is None:
-                    continue
-                data["partial_scores"][answer_name]["weight"] = 0.0
 
-    data["partial_scores"][name] = {"score": score_sum / (num_rows * num_output)}
+    with profile.step("partial_scores"):
+        cell_scores = {}
+        for k, (subs, mask) in enumerate(zip(cell_subs, correct_masks)):
+            for answer_name, a_sub, flag in zip(
+                cell_names(name, num_rows, k), subs, mask_to_flags(mask, num_rows)
+            ):
+                cell_scores[answer_name] = cell_partial_score(
+                    flag == "1", a_sub, all_or_nothing_failed
+                )
+        data["partial_scores"].update(cell_scores)
+
+        data["partial_scores"][name] = {
+            "score": score_sum / (num_rows * num_output),
+            "column_correct": column_correct,
+            "correct_cells": [format(mask, "x") for mask in correct_masks],
+        }
+
+    profile.finish(
+        rows=num_rows,
+        cells=num_rows * num_output,
+        correct=sum(column_correct),
+    )
+
+
+def warm_up(element_html: str | None = None) -> None:
+    """Load everything render needs and fill the caches ahead of the first request.
+
+    Called with the markup of an element, e.g. from a worker that is started in
+    advance, it also compiles the element and builds its rows. Must run in the
+    element directory, like the other phases.
+    """
+    get_template_sections()
+    if element_html is None:
+        return
+    spec = compile_spec(element_html)
+    for k in range(spec.num_outputs):
+        cell_names(spec.name, spec.num_rows, k)
+    # Sampled tables only compute the rows of each variant
+    if spec.sample_rows:
+        return
+    input_rows(spec.bit_widths, spec.alphabet)
+    if spec.expressions:
+        evaluate_expressions(spec.expressions, spec.input_names, spec.alphabet)
+
+
+def clear_caches() -> None:
+    """Forget the rendered HTML and table models in memory.
+
+    The caches that only depend on the element (specs, rows, expressions) are
+    kept, as after warm_up.
+    """
+    _render_cache.clear()
+    _table_models.clear()
@@ -0,0 +1,234 @@
+"""Offline batch regrading for pl-truth-table.
+
+After fixing a wrong correct answer, stored submissions can be regraded with the
+same code path as PrairieLearn's per-submission `grade`:
+
+    from truth_table_batch import regrade
+
+    for partial_scores in regrade(element_html, submissions):
+        ...
+
+Each submission is a dict with (at least) the parsed "submitted_answers" of the
+element, as stored by PrairieLearn, and the "correct_answers" set by server.py
+for its variant if the question picks them at random. The script can also be run from the command
+line on a file of JSON lines, see `python truth_table_batch.py --help`.
+"""
+
+import argparse
+import importlib.util
+import json
+import os
+import sys
+from collections import OrderedDict, deque
+from collections.abc import Iterable, Iterator
+from concurrent.futures import Future, ProcessPoolExecutor
+from itertools import islice
+from types import ModuleType
+from typing import Any
+
+ELEMENT_DIR = os.path.dirname(os.path.abspath(__file__))
+CONTROLLER_PATH = os.path.join(ELEMENT_DIR, "pl-truth-table.py")
+# Stand-in for the prairielearn module when regrading outside of PrairieLearn
+STUB_DIR = os.path.join(ELEMENT_DIR, "..", "..", "tools", "stubs")
+
+CHUNK_SIZE_DEFAULT = 64
+# Variants whose correct answers are kept by each worker
+VARIANT_CACHE_SIZE = 64
+
+# Per-process state, set up once by _init_worker
+_controller: ModuleType | None = None
+_element_html = ""
+_correct_answers: dict[str, Any] = {}
+_name = ""
+# Whether the element has a correct-answer or expression attribute, which takes
+# precedence over correct answers that PrairieLearn prepared and stored
+_own_answers = False
+# With sample-rows, every variant has its own rows and is prepared separately
+_per_variant = False
+_variants: OrderedDict[str, dict[str, Any]] = OrderedDict()
+
+
+def load_controller() -> ModuleType:
+    """Import pl-truth-table.py, which cannot be imported by name"""
+    try:
+        import prairielearn  # noqa: F401
+    except ImportError:
+        sys.path.append(os.path.abspath(STUB_DIR))
+    module_spec = importlib.util.spec_from_file_location(
+        "pl_truth_table", CONTROLLER_PATH
+    )
+    controller = importlib.util.module_from_spec(module_spec)
+    module_spec.loader.exec_module(controller)
+    return controller
+
+
+def prepare_correct_answers(
+    controller: ModuleType,
+    element_html: str,
+    correct_answers: dict[str, Any] | None = None,
+    params: dict[str, Any] | None = None,
+) -> dict[str, Any]:
+    """Run the element's prepare to get the correct answers of a variant"""
+    data = {
+        "params": dict(params or {}),
+        "correct_answers": dict(correct_answers or {}),
+    }
+    controller.prepare(element_html, data)
+    return data["correct_answers"]
+
+
+def has_own_answers(spec: Any) -> bool:
+    return spec.correct_answer is not None or bool(spec.expressions)
+
+
+def _init_worker(
+    sys_path: list[str], element_html: str, correct_answers: dict[str, Any]
+) -> None:
+    global _controller, _element_html, _correct_answers, _per_variant
+    global _name, _own_answers
+    sys.path[:] = sys_path
+    _controller = load_controller()
+    _element_html = element_html
+    _correct_answers = correct_answers
+    # Compile the element in each worker once, rather than on the first submission
+    spec = _controller.compile_spec(element_html)
+    _per_variant = bool(spec.sample_rows)
+    _name = spec.name
+    _own_answers = has_own_answers(spec)
+
+
+def _variant_correct_answers(
+    correct_answers: dict[str, Any], params: dict[str, Any]
+) -> dict[str, Any]:
+    """Prepared correct answers of a variant, prepared once per worker"""
+    key = json.dumps(
+        [correct_answers, params if _per_variant else None], sort_keys=True
+    )
+    prepared = _variants.get(key)
+    if prepared is None:
+        prepared = prepare_correct_answers(
+            _controller, _element_html, correct_answers, params
+        )
+        _variants[key] = prepared
+    _variants.move_to_end(key)
+    while len(_variants) > VARIANT_CACHE_SIZE:
+        _variants.popitem(last=False)
+    return prepared
+
+
+def _grade_chunk(submissions: list[dict[str, Any]]) -> list[dict[str, Any]]:
+    results = []
+    for submission in submissions:
+        params = submission.get("params", {})
+        correct_answers = _correct_answers
+        # Questions that randomize their tables in server.py have their own
+        # correct answers per variant: either the string set by server.py, or
+        # the answers PrairieLearn stored after prepare (per cell or packed)
+        stored = submission.get("correct_answers")
+        if stored is not None and isinstance(stored.get(_name), str):
+            correct_answers = _variant_correct_answers(stored, params)
+        elif stored is not None and not _own_answers:
+            correct_answers = stored
+        elif _per_variant:
+            correct_answers = _variant_correct_answers(correct_answers, params)
+        data = {
+            "params": params,
+            "correct_answers": correct_answers,
+            "submitted_answers": submission["submitted_answers"],
+            "format_errors": submission.get("format_errors", {}),
+            "partial_scores": {},
+        }
+        _controller.grade(_element_html, data)
+        results.append(data["partial_scores"])
+    return results
+
+
+def regrade(
+    element_html: str,
+    submissions: Iterable[dict[str, Any]],
+    *,
+    correct_answers: dict[str, Any] | None = None,
+    max_workers: int | None = None,
+    chunk_size: int = CHUNK_SIZE_DEFAULT,
+) -> Iterator[dict[str, Any]]:
+    """Grade submissions across a process pool, yielding partial scores in order.
+
+    The correct answers are prepared once from `element_html`, or from
+    `correct_answers` if they were set by server.py (e.g. {"q1": "[0,1,1,1]"}),
+    and shared with every worker. A submission with its own "correct_answers",
+    as set by server.py for its variant, is graded against those instead; if
+    they are the answers PrairieLearn stored after prepare, they are only used
+    when the element has no correct-answer or expression of its own. Tables
+    with sample-rows are prepared for each variant, from the rows stored in its
+    "params". Attributes filled in from params (e.g. "{{params.q2-answer}}") are
+    not substituted, so such submissions must be regraded with their variant's
+    `element_html`. Submissions are
+    consumed lazily in chunks, so results start streaming back before the input
+    is exhausted.
+    """
+    controller = load_controller()
+    spec = controller.compile_spec(element_html)
+    # Without answers in the element, each submission brings its variant's own
+    has_answers = correct_answers or has_own_answers(spec)
+    if spec.sample_rows or not has_answers:
+        prepared = dict(correct_answers or {})
+    else:
+        prepared = prepare_correct_answers(controller, element_html, correct_answers)
+    submissions = iter(submissions)
+
+    max_workers = max_workers or os.cpu_count() or 1
+
+    with ProcessPoolExecutor(
+        max_workers=max_workers,
+        initializer=_init_worker,
+        initargs=(list(sys.path), element_html, prepared),
+    ) as executor:
+        # Keep a bounded number of chunks in flight to cap memory use
+        max_pending = 2 * max_workers
+        pending: deque[Future] = deque()
+        while True:
+            while len(pending) < max_pending:
+                chunk = list(islice(submissions, chunk_size))
+                if not chunk:
+                    break
+                pending.append(executor.submit(_grade_chunk, chunk))
+            if not pending:
+                return
+            yield from pending.popleft().result()
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(
+        description="Regrade stored pl-truth-table submissions."
+    )
+    parser.add_argument("element", help="file with the <pl-truth-table> element HTML")
+    parser.add_argument(
+        "submissions", help='JSON lines file, each with a "submitted_answers" dict'
+    )
+    parser.add_argument(
+        "--correct-answers",
+        help='JSON dict of data["correct_answers"] as set by server.py',
+    )
+    parser.add_argument("--workers", type=int, default=None)
+    parser.add_argument("--chunk-size", type=int, default=CHUNK_SIZE_DEFAULT)
+    args = parser.parse_args()
+
+    with open(args.element, encoding="utf-8") as f:
+        element_html = f.read().strip()
+    correct_answers = None
+    if args.correct_answers:
+        correct_answers = json.loads(args.correct_answers)
+    with open(args.submissions, encoding="utf-8") as f:
+        submissions = (json.loads(line) for line in f if line.strip())
+        for partial_scores in regrade(
+            element_html,
+            submissions,
+            correct_answers=correct_answers,
+            max_workers=args.workers,
+            chunk_size=args.chunk_size,
+        ):
+            print(json.dumps(partial_scores))
+
+
+if __name__ == "__main__":
+    main()
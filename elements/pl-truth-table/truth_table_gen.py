@@ -0,0 +1,109 @@
+"""Generate correct answers for pl-truth-table in a question's server.py.
+
+Instead of writing out a table such as "[0,0,0,1]", describe the outputs as a
+function of the inputs. The function is called once with a NumPy array of all
+values of each input (in `input-name` order) and returns an array of output
+values, or a tuple of arrays for several outputs:
+
+    from truth_table_gen import correct_answer
+
+    def add(a, b):
+        return a + b
+
+    data["correct_answers"]["q3"] = correct_answer(add, ["A", "B"], 2, 3)
+
+gives the sum column of a 2-bit adder (16 rows, 3-bit outputs) in exactly the
+format the element expects. Arithmetic and bitwise operators work on whole
+arrays; wrap functions that only take single numbers with numpy.vectorize.
+
+Results are cached by the arguments, so define the functions once at module
+level (not as a new lambda in every call to generate) to generate many
+variants quickly.
+"""
+
+from collections.abc import Callable, Sequence
+from functools import lru_cache
+from typing import Any
+
+import numpy as np
+
+ALPHABET_DEFAULT = "10"
+CACHE_SIZE = 256
+
+
+def input_arrays(bit_widths: Sequence[int]) -> list[np.ndarray]:
+    """Value of each input in every row, with the first input as the most significant bits"""
+    num_bits = sum(bit_widths)
+    rows = np.arange(2**num_bits, dtype=np.int64)
+    arrays = []
+    shift = num_bits
+    for width in bit_widths:
+        shift -= width
+        arrays.append((rows >> shift) & ((1 << width) - 1))
+    return arrays
+
+
+def format_column(values: np.ndarray, width: int, alphabet: str) -> str:
+    """Format one output column like "[01,10,11]" using the alphabet's true/false characters"""
+    bits = (values[:, np.newaxis] >> np.arange(width - 1, -1, -1)) & 1
+    # One character per bit plus a separator per row, joined in a single step
+    chars = np.empty((len(values), width + 1), dtype="<U1")
+    chars[:, :width] = np.where(bits == 1, alphabet[0], alphabet[1])
+    chars[:, width] = ","
+    return "[" + chars.tobytes().decode("utf-32-le")[:-1] + "]"
+
+
+@lru_cache(maxsize=CACHE_SIZE)
+def _correct_answer(
+    function: Callable[..., Any],
+    bit_widths: tuple[int, ...],
+    output_widths: tuple[int, ...] | int,
+    alphabet: str,
+) -> str:
+    inputs = input_arrays(bit_widths)
+    num_rows = len(inputs[0]) if inputs else 1
+    outputs = function(*inputs)
+    if not isinstance(outputs, (tuple, list)):
+        outputs = (outputs,)
+    if isinstance(output_widths, int):
+        output_widths = (output_widths,) * len(outputs)
+    if len(output_widths) != len(outputs):
+        raise ValueError(
+            f"The function returned {len(outputs)} output(s), but {len(output_widths)} output width(s) were given."
+        )
+
+    columns = []
+    for k, (output, width) in enumerate(zip(outputs, output_widths)):
+        values = np.broadcast_to(np.asarray(output).astype(np.int64), (num_rows,))
+        if values.min() < 0 or values.max() >= 2**width:
+            raise ValueError(
+                f"Output {k} has values that do not fit in {width} bit(s)."
+            )
+        columns.append(format_column(values, width, alphabet))
+    return ", ".join(columns)
+
+
+def correct_answer(
+    function: Callable[..., Any],
+    input_names: Sequence[str],
+    bit_width: int | Sequence[int] = 1,
+    output_width: int | Sequence[int] = 1,
+    alphabet: str = ALPHABET_DEFAULT,
+) -> str:
+    """Correct answer string for a table whose outputs are function(*inputs).
+
+    input_names, bit_width and alphabet are the element's input-name, bit-width
+    and alphabet; output_width is the number of bits of each output (one number
+    for all outputs, or one per output).
+    """
+    if isinstance(bit_width, int):
+        bit_widths = (bit_width,) * len(input_names)
+    else:
+        bit_widths = tuple(bit_width)
+    if len(bit_widths) != len(input_names):
+        raise ValueError(
+            f"The number of bit widths ({len(bit_widths)}) must match the number of inputs ({len(input_names)})."
+        )
+    if not isinstance(output_width, int):
+        output_width = tuple(output_width)
+    return _correct_answer(function, bit_widths, output_width, alphabet)
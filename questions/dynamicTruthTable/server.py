@@ -1,4 +1,20 @@
+import os
 import random
+import sys
+
+# The helper for generating correct answers is shipped next to the element
+sys.path.append(
+    os.path.join(os.path.dirname(__file__), "..", "..", "elements", "pl-truth-table")
+)
+from truth_table_gen import correct_answer
+
+
+def add(a, b):
+    return a + b
+
+
+def multiply(a, b):
+    return a * b
 
 
 def generate(data):
@@ -27,4 +43,14 @@ def generate(data):
     data["params"]["q2-output-names"] = f"[{q2TableData[1].join(q2Inputs)}]"
     data["params"]["q2-correct-answer"] = q2TableData[2]
 
+    # Option 3: Computing the correct answer from a function of the inputs
+    q3Operator, q3Function, q3OutputWidth = random.choice(
+        [["+", add, 3], ["*", multiply, 4]]
+    )
+    data["params"]["q3-operator"] = q3Operator
+    data["params"]["q3-output-name"] = f"A {q3Operator} B"
+    data["correct_answers"]["q3"] = correct_answer(
+        q3Function, ["A", "B"], bit_width=2, output_width=q3OutputWidth
+    )
+
     return data
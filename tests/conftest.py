@@ -0,0 +1,47 @@
+"""The element controller and question data, set up as PrairieLearn does."""
+
+import os
+import sys
+from collections.abc import Callable
+from types import ModuleType
+from typing import Any
+
+import pytest
+
+ELEMENT_DIR = os.path.join(
+    os.path.dirname(os.path.dirname(os.path.abspath(__file__))),
+    "elements",
+    "pl-truth-table",
+)
+sys.path.insert(0, ELEMENT_DIR)
+from truth_table_batch import load_controller
+
+
+@pytest.fixture(scope="session")
+def controller() -> ModuleType:
+    return load_controller()
+
+
+@pytest.fixture
+def make_data() -> Callable[..., dict[str, Any]]:
+    """Question data of a new variant, with the given fields replaced"""
+
+    def make(**fields: Any) -> dict[str, Any]:
+        data: dict[str, Any] = {
+            "params": {},
+            "correct_answers": {},
+            "variant_seed": 1,
+            "submitted_answers": {},
+            "format_errors": {},
+            "partial_scores": {},
+        }
+        data.update(fields)
+        return data
+
+    return make
+
+
+@pytest.fixture
+def in_element_dir(monkeypatch: pytest.MonkeyPatch) -> None:
+    """Templates are read relative to the element directory, as in PrairieLearn"""
+    monkeypatch.chdir(ELEMENT_DIR)
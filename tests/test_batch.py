@@ -0,0 +1,95 @@
+"""Batch regrading must give the same results as grade, variant by variant."""
+
+from collections.abc import Callable
+from types import ModuleType
+
+import pytest
+from truth_table_batch import regrade
+
+ELEMENT = (
+    '<pl-truth-table answers-name="q1" input-name="[A, B]" output-name="[F]">'
+    "</pl-truth-table>"
+)
+# Correct answers picked at random by server.py, as in dynamicTruthTable
+VARIANTS = [{"q1": "[0,0,0,1]"}, {"q1": "[0,1,1,1]"}, {"q1": "[0,1,1,0]"}]
+
+
+def test_each_variant_is_graded_against_its_answers(
+    controller: ModuleType, make_data: Callable[..., dict]
+) -> None:
+    def graded(correct_answers: dict) -> dict:
+        data = make_data(
+            correct_answers=dict(correct_answers), submitted_answers=dict(submitted)
+        )
+        controller.prepare(ELEMENT, data)
+        controller.grade(ELEMENT, data)
+        return data["partial_scores"]
+
+    submitted = {"q1_0_0": "0", "q1_1_0": "1", "q1_2_0": "1", "q1_3_0": "1"}
+    submissions = [
+        {"submitted_answers": submitted, "correct_answers": correct_answers}
+        for correct_answers in VARIANTS * 3
+    ]
+    results = list(regrade(ELEMENT, submissions, max_workers=2, chunk_size=2))
+    assert results == [graded(correct_answers) for correct_answers in VARIANTS * 3]
+    assert [result["q1"]["score"] for result in results[:3]] == [0.5, 1, 0.75]
+
+
+PACKED_ELEMENT = (
+    '<pl-truth-table answers-name="q1" input-name="[A, B]" output-name="[F]" '
+    'packed-answers="true"{}></pl-truth-table>'
+)
+
+
+@pytest.fixture
+def stored_correct_answers(
+    controller: ModuleType, make_data: Callable[..., dict]
+) -> Callable[[str, dict], dict]:
+    """data["correct_answers"] as PrairieLearn stores it after prepare"""
+
+    def stored(element_html: str, correct_answers: dict) -> dict:
+        data = make_data(correct_answers=dict(correct_answers))
+        controller.prepare(element_html, data)
+        return data["correct_answers"]
+
+    return stored
+
+
+def test_stored_packed_answers_are_graded_as_they_are(
+    stored_correct_answers: Callable[[str, dict], dict],
+) -> None:
+    element_html = PACKED_ELEMENT.format("")
+    submitted = {"q1_0_0": "0", "q1_1_0": "1", "q1_2_0": "1", "q1_3_0": "1"}
+    submissions = [
+        {
+            "submitted_answers": submitted,
+            "correct_answers": stored_correct_answers(element_html, correct_answers),
+        }
+        for correct_answers in VARIANTS
+    ]
+    assert isinstance(submissions[0]["correct_answers"]["q1"], dict)
+    results = list(regrade(element_html, submissions, max_workers=1))
+    assert [result["q1"]["score"] for result in results] == [0.5, 1, 0.75]
+
+
+def test_fixed_attribute_takes_precedence_over_stored_answers(
+    stored_correct_answers: Callable[[str, dict], dict],
+) -> None:
+    stored = stored_correct_answers(PACKED_ELEMENT.format(""), VARIANTS[0])
+    fixed = PACKED_ELEMENT.format(' correct-answer="[0,1,1,1]"')
+    submitted = {"q1_0_0": "0", "q1_1_0": "1", "q1_2_0": "1", "q1_3_0": "1"}
+    submissions = [{"submitted_answers": submitted, "correct_answers": stored}]
+    (result,) = regrade(fixed, submissions, max_workers=1)
+    assert result["q1"]["score"] == 1
+
+
+def test_prepare_accepts_packed_answers(
+    stored_correct_answers: Callable[[str, dict], dict],
+) -> None:
+    element_html = PACKED_ELEMENT.format("")
+    stored = stored_correct_answers(element_html, VARIANTS[1])
+    assert stored_correct_answers(element_html, stored) == stored
+
+    broken = dict(stored, q1={"width": [1], "values": ["011"]})
+    with pytest.raises(ValueError):
+        stored_correct_answers(element_html, broken)
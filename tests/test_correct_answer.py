@@ -0,0 +1,101 @@
+"""Dense correct-answer strings: the one-pass scan and its error messages."""
+
+import random
+import re
+from types import ModuleType
+
+import pytest
+
+ELEMENT = (
+    '<pl-truth-table answers-name="q" input-name="[A, B, C]" '
+    'output-name="[F, G]" alphabet="01x"></pl-truth-table>'
+)
+
+
+def reference_columns(spec: object, output_string: str) -> list[tuple[int, str]] | None:
+    """Split on "],[" and "," after removing whitespace, checking every value"""
+    # As before the one-pass scan, brackets of a list must not be spaced apart
+    if re.search(r"[\[\]]\s+[\[\]]", output_string):
+        return None
+    compact = re.sub(r"\s", "", output_string).lstrip("[").rstrip("]")
+    output_list = re.split(r"\]+,\[+", compact)
+    if len(output_list) != spec.num_outputs:
+        return None
+    columns = []
+    for output in output_list:
+        values = output.split(",")
+        width = len(values[0])
+        if (
+            len(values) != spec.table_rows
+            or width < 1
+            or any(len(value) != width for value in values)
+            or not set("".join(values)).issubset(spec.alphabet)
+        ):
+            return None
+        columns.append((width, "".join(values)))
+    return columns
+
+
+def random_answer(rng: random.Random, num_outputs: int, num_rows: int) -> str:
+    lists = []
+    for _ in range(num_outputs):
+        width = rng.randint(1, 3)
+        values = ("".join(rng.choices("01x", k=width)) for _ in range(num_rows))
+        lists.append("[" + rng.choice([",", ", ", " ,\n"]).join(values) + "]")
+    return rng.choice([",", ", ", " , "]).join(lists)
+
+
+def corrupted(rng: random.Random, answer: str) -> str:
+    position = rng.randrange(len(answer) + 1)
+    change = rng.choice(["insert", "delete", "replace"])
+    character = rng.choice("01x2[], ")
+    if change == "insert":
+        return answer[:position] + character + answer[position:]
+    if change == "delete":
+        return answer[:position] + answer[position + 1 :]
+    return answer[:position] + character + answer[position + 1 :]
+
+
+def test_scan_matches_reference(controller: ModuleType) -> None:
+    spec = controller.compile_spec(ELEMENT)
+    rng = random.Random(0)
+    invalid = 0
+    for _ in range(2000):
+        answer = random_answer(rng, spec.num_outputs, spec.table_rows)
+        if rng.random() < 0.7:
+            answer = corrupted(rng, answer)
+        columns = controller.scan_correct_answer(spec, answer)
+        expected = reference_columns(spec, answer)
+        if columns is not None:
+            columns = [(column.width, column.values) for column in columns]
+        assert columns == expected, answer
+        if expected is None:
+            invalid += 1
+            with pytest.raises(ValueError):
+                controller.parse_correct_answer(spec, answer)
+    assert invalid > 500
+
+
+@pytest.mark.parametrize(
+    ("answer", "message"),
+    [
+        (
+            "[0,1,1,0,0,1,1,0],[0,1,2,0,0,1,1,0]",
+            'Invalid format. Provided output "2" not in alphabet',
+        ),
+        ("[0,1,1,0,0,1,1],[0,1,1,0,0,1,1,0]", "The length of the correct answer (7)"),
+        ("[0,1,1,0,0,1,1,0],[0,1,,0,0,1,1,0]", "Missing value (output list 1, row 2"),
+        ("[0,1,1,0,0,1,1,0][0,1,1,0,0,1,1,0]", 'Unexpected "[" (output list 0, row 8'),
+        (
+            "[0,1,1,0,0,1,1,0],[0,10,1,0,0,1,1,0]",
+            "is not consistent (2 instead of 1) (output list 1, row 1, character 21)",
+        ),
+        ("[0,1,1,0,0,1,1,0]", "The number of output lists (1)"),
+    ],
+)
+def test_errors_name_their_position(
+    controller: ModuleType, answer: str, message: str
+) -> None:
+    spec = controller.compile_spec(ELEMENT)
+    assert controller.scan_correct_answer(spec, answer) is None
+    assert message in controller.correct_answer_error(spec, answer)
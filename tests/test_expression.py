@@ -0,0 +1,81 @@
+"""Correct answers computed from the expression attribute."""
+
+import random
+from types import ModuleType
+
+import pytest
+
+INPUTS = ("A", "B", "C", "D")
+# Python evaluates these the same way on 0/1 ints, so eval is the reference
+EXPRESSIONS = [
+    "A and B or not C",
+    "(A or B) and (C or D)",
+    "A xor B xor C",
+    "A & B | C ^ D",
+    "not (A and not B) or 0",
+    "1 and D",
+    "A",
+]
+
+
+def reference_column(expression: str, alphabet: str, rows: list[int]) -> str:
+    """Every row evaluated on its own by Python, first input most significant"""
+    code = compile(expression.replace("xor", "^"), "<expression>", "eval")
+    values = []
+    for row in rows:
+        inputs = {
+            name: row >> (len(INPUTS) - 1 - j) & 1 for j, name in enumerate(INPUTS)
+        }
+        true = eval(code, {"__builtins__": {}}, inputs)
+        values.append(alphabet[0] if true else alphabet[1])
+    return "".join(values)
+
+
+@pytest.mark.parametrize("alphabet", ["10", "TF"])
+def test_expressions_match_row_by_row(controller: ModuleType, alphabet: str) -> None:
+    num_rows = 2 ** len(INPUTS)
+    columns = controller.evaluate_expressions(tuple(EXPRESSIONS), INPUTS, alphabet)
+    assert list(columns) == [
+        reference_column(expression, alphabet, list(range(num_rows)))
+        for expression in EXPRESSIONS
+    ]
+
+    rows = tuple(sorted(random.Random(0).sample(range(num_rows), 5)))
+    sampled = controller.evaluate_expressions(
+        tuple(EXPRESSIONS), INPUTS, alphabet, rows
+    )
+    assert list(sampled) == [
+        reference_column(expression, alphabet, list(rows)) for expression in EXPRESSIONS
+    ]
+
+
+def test_invert_is_not(controller: ModuleType) -> None:
+    (column,) = controller.evaluate_expressions(("~A xor B",), ("A", "B"), "10")
+    assert column == "1001"
+
+
+@pytest.mark.parametrize(
+    "expression",
+    [
+        "A(B)",
+        "A.real",
+        "A + B",
+        "A == B",
+        "A if B else C",
+        "2",
+        "[A]",
+        "lambda: A",
+        "__import__('os')",
+        "A and",
+    ],
+)
+def test_only_logic_operators_are_allowed(
+    controller: ModuleType, expression: str
+) -> None:
+    with pytest.raises(ValueError, match="Invalid expression"):
+        controller.compile_expression(expression)
+
+
+def test_unknown_inputs_are_rejected(controller: ModuleType) -> None:
+    with pytest.raises(ValueError, match='Unknown input "E"'):
+        controller.evaluate_expressions(("A and E",), INPUTS, "10")
@@ -0,0 +1,73 @@
+"""Grading by column bitsets must give the same results as grading cell by cell."""
+
+import copy
+import random
+from collections.abc import Callable
+from types import ModuleType
+
+import pytest
+
+ELEMENT = (
+    '<pl-truth-table answers-name="q" input-name="[A, B, C, D, E]" '
+    'output-name="[F, G]" expression="[A and B or E, C ^ D]"{}></pl-truth-table>'
+)
+
+
+def correct_cells(
+    controller: ModuleType, element_html: str, data: dict
+) -> dict[str, str]:
+    spec = controller.compile_spec(element_html)
+    return {
+        f"q_{row}_{k}": column.cell(row)
+        for k, column in enumerate(controller.get_correct_columns(spec, data))
+        for row in range(spec.num_rows)
+    }
+
+
+def reference_scores(
+    correct: dict, submitted: dict, partial_credit: bool
+) -> tuple[dict, float]:
+    """Every cell compared on its own, as grade did before column bitsets"""
+    right = {
+        name: submitted.get(name) is not None
+        and submitted[name].lower() == value.lower()
+        for name, value in correct.items()
+    }
+    failed = not partial_credit and not all(right.values())
+    scores = {}
+    for name, is_right in right.items():
+        if is_right:
+            scores[name] = {"score": 1, "feedback": "Correct."}
+        elif submitted.get(name) is None:
+            scores[name] = {"score": 0, "feedback": "Missing input."}
+        else:
+            scores[name] = {"score": 0, "feedback": "Incorrect."}
+        if failed:
+            scores[name]["weight"] = 0.0
+    total = 0 if failed else sum(right.values()) / len(right)
+    return scores, total
+
+
+@pytest.mark.parametrize("partial_credit", [True, False])
+def test_grade_matches_cell_by_cell(
+    controller: ModuleType, make_data: Callable[..., dict], partial_credit: bool
+) -> None:
+    attributes = "" if partial_credit else ' partial-credit="false"'
+    element_html = ELEMENT.format(attributes)
+    data = make_data()
+    controller.prepare(element_html, data)
+    correct = correct_cells(controller, element_html, data)
+    names = sorted(correct)
+    rng = random.Random(0)
+    for changes in (0, 1, 3, 40, len(names)):
+        submitted = dict(correct)
+        for name in rng.sample(names, changes):
+            submitted[name] = rng.choice(["0", "1", None, "x", "T"])
+        graded = copy.deepcopy(data)
+        graded["submitted_answers"] = dict(submitted)
+        controller.grade(element_html, graded)
+
+        scores, total = reference_scores(correct, submitted, partial_credit)
+        partial_scores = graded["partial_scores"]
+        assert {name: partial_scores[name] for name in names} == scores
+        assert partial_scores["q"]["score"] == total
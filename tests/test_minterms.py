@@ -0,0 +1,62 @@
+"""Sparse correct answers must give the same rows with and without sampling."""
+
+import random
+import tracemalloc
+from collections.abc import Callable
+from types import ModuleType
+
+
+def random_rows(rng: random.Random, num_rows: int) -> str:
+    parts = []
+    for _ in range(rng.randint(0, 6)):
+        first = rng.randrange(num_rows)
+        last = min(num_rows - 1, first + rng.randrange(10))
+        parts.append(str(first) if rng.random() < 0.4 else f"{first}..{last}")
+    return ", ".join(parts)
+
+
+def test_sampled_rows_match_full_table(controller: ModuleType) -> None:
+    spec = controller.compile_spec(
+        '<pl-truth-table answers-name="q" input-name="[A, B, C, D, E, F]" '
+        'output-name="[X, Y]" correct-answer="m(1), m(2)"></pl-truth-table>'
+    )
+    rng = random.Random(0)
+    checked = 0
+    while checked < 200:
+        terms = [
+            f"m({random_rows(rng, 64)}) d({random_rows(rng, 64)})" for _ in range(2)
+        ]
+        try:
+            full = controller.parse_minterms(spec, ", ".join(terms))
+        except ValueError:
+            continue
+        rows = sorted(rng.sample(range(64), 10))
+        sampled = controller.parse_minterms(spec, ", ".join(terms), rows)
+        for full_column, sampled_column in zip(full, sampled):
+            assert sampled_column.values == "".join(full_column.cell(r) for r in rows)
+        checked += 1
+
+
+def test_sampled_ranges_are_not_expanded(
+    controller: ModuleType, make_data: Callable[..., dict]
+) -> None:
+    inputs = ", ".join(f"X{i}" for i in range(30))
+    element_html = (
+        f'<pl-truth-table answers-name="q" input-name="[{inputs}]" output-name="[F]" '
+        'sample-rows="20" correct-answer="m(0..100000000) d(100000001..200000000)">'
+        "</pl-truth-table>"
+    )
+    data = make_data()
+    tracemalloc.start()
+    controller.prepare(element_html, data)
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    assert peak < 1024 * 1024
+
+    spec = controller.compile_spec(element_html)
+    rows = controller.sampled_rows(spec, data)
+    (column,) = controller.get_correct_columns(spec, data)
+    expected = [
+        "1" if row <= 100000000 else "-" if row <= 200000000 else "0" for row in rows
+    ]
+    assert [column.cell(i) for i in range(len(rows))] == expected
@@ -0,0 +1,112 @@
+"""Parsing of submitted cells, posted one per field or packed into one field."""
+
+import json
+import random
+from collections.abc import Callable
+from types import ModuleType
+
+import pytest
+
+ELEMENT = (
+    '<pl-truth-table answers-name="q" input-name="[A, B, C]" output-name="[F, G]" '
+    'correct-answer="[0,1,1,0,0,1,1,0],[00,01,10,11,00,01,10,11]"{}>'
+    "</pl-truth-table>"
+)
+
+
+def random_cells(rng: random.Random, count: int) -> list[str | None]:
+    return [
+        rng.choice([None, "", "0", "1", "T", "01", "10", "1x", "111"])
+        for _ in range(count)
+    ]
+
+
+@pytest.mark.parametrize("attributes", ["", ' aggregate-format-errors="true"'])
+def test_packed_submission_matches_cell_fields(
+    controller: ModuleType, make_data: Callable[..., dict], attributes: str
+) -> None:
+    packed_html = ELEMENT.format(' packed-submission="true"' + attributes)
+    fields_html = ELEMENT.format(attributes)
+    rng = random.Random(0)
+    for count in (16, 16, 16, 10, 0):
+        cells = random_cells(rng, count)
+        packed = make_data(submitted_answers={"q": json.dumps(cells)})
+        controller.prepare(packed_html, packed)
+        controller.parse(packed_html, packed)
+
+        # Cells left out of the packed list are the fields that were not posted
+        fields = make_data(
+            submitted_answers={
+                f"q_{index // 2}_{index % 2}": cell
+                for index, cell in enumerate(cells)
+                if cell is not None
+            }
+        )
+        controller.prepare(fields_html, fields)
+        controller.parse(fields_html, fields)
+
+        assert packed["submitted_answers"] == fields["submitted_answers"]
+        assert packed["format_errors"] == fields["format_errors"]
+
+
+@pytest.mark.parametrize(
+    "packed", [None, "", "[0,", '{"q_0_0": "1"}', '["1", 1]', '"1"', "[[]]"]
+)
+def test_malformed_packed_submissions(controller: ModuleType, packed: object) -> None:
+    assert controller.unpack_submission(packed) is None
+
+
+def test_unreadable_table_is_a_format_error(
+    controller: ModuleType, make_data: Callable[..., dict]
+) -> None:
+    element_html = ELEMENT.format(' packed-submission="true"')
+    data = make_data(submitted_answers={"q": "not json"})
+    controller.prepare(element_html, data)
+    controller.parse(element_html, data)
+
+    assert "q" not in data["submitted_answers"]
+    assert data["format_errors"]["q"].startswith("Invalid format.")
+    assert all(
+        data["submitted_answers"][f"q_{row}_{k}"] is None
+        for row in range(8)
+        for k in range(2)
+    )
+
+
+def test_aggregated_format_errors_round_trip(
+    controller: ModuleType, make_data: Callable[..., dict]
+) -> None:
+    spec = controller.compile_spec(
+        '<pl-truth-table answers-name="q" input-name="[A, B, C, D, E, F]" '
+        'output-name="[X, Y, Z]" aggregate-format-errors="true"></pl-truth-table>'
+    )
+    rng = random.Random(0)
+    kinds = ["missing", "blank", "length", "alphabet"]
+    cells = [(row, k) for row in range(64) for k in range(3)]
+    for count in (1, 5, 40, len(cells)):
+        chosen = rng.sample(cells, count) + [(0, 0), (63, 2)]
+        errors = {cell: rng.choice(kinds) for cell in chosen}
+        data = make_data()
+        controller.store_format_errors(
+            spec, data, [1, 1, 1], [(row, k, kind) for (row, k), kind in errors.items()]
+        )
+
+        # PrairieLearn stores the summary as JSON until the submission is rendered
+        data = json.loads(json.dumps(data))
+
+        expected = [{} for _ in range(3)]
+        for (row, k), kind in errors.items():
+            expected[k][row] = kind
+        assert controller.format_error_kinds(spec, data) == expected
+        summary = data["format_errors"]["q"]
+        assert sum(summary["counts"].values()) == len(errors)
+
+
+def test_no_summary_without_errors(
+    controller: ModuleType, make_data: Callable[..., dict]
+) -> None:
+    spec = controller.compile_spec(ELEMENT.format(' aggregate-format-errors="true"'))
+    data = make_data()
+    controller.store_format_errors(spec, data, [1, 2], [])
+    assert data["format_errors"] == {}
+    assert controller.format_error_kinds(spec, data) is None
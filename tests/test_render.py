@@ -0,0 +1,29 @@
+"""Rendering of submitted cells in the different render modes."""
+
+from collections.abc import Callable
+from types import ModuleType
+
+import pytest
+
+ELEMENT = (
+    '<pl-truth-table answers-name="q" input-name="[A, B]" output-name="[F]" '
+    'expression="[A and B]"{}></pl-truth-table>'
+)
+
+
+@pytest.mark.parametrize("attributes", ["", ' compact-render="true"'])
+@pytest.mark.parametrize("panel", ["question", "submission"])
+@pytest.mark.usefixtures("in_element_dir")
+def test_blank_cells_are_rendered_empty(
+    controller: ModuleType, make_data: Callable[..., dict], attributes: str, panel: str
+) -> None:
+    element_html = ELEMENT.format(attributes)
+    data = make_data(
+        submitted_answers={"q_0_0": "", "q_1_0": "1", "q_2_0": "0", "q_3_0": "1"}
+    )
+    controller.prepare(element_html, data)
+    controller.parse(element_html, data)
+    assert data["submitted_answers"]["q_0_0"] is None
+
+    html = controller.render(element_html, dict(data, panel=panel))
+    assert "None" not in html
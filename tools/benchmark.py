@@ -0,0 +1,411 @@
+"""Benchmarks for the pl-truth-table element lifecycle.
+
+Runs prepare, render (question/submission/answer panels), parse and grade for a
+sweep of table sizes and for the example question, recording wall time, peak
+memory and the size of the emitted HTML and stored JSON. Outside of PrairieLearn
+the `prairielearn` stand-in from tools/stubs is used; chevron and lxml must be
+installed.
+
+    python tools/benchmark.py                 # print results
+    python tools/benchmark.py --save          # store them as the new baseline
+    python tools/benchmark.py --compare       # fail if slower/larger than baseline
+
+Timings are machine dependent, so regenerate the baseline on the machine that
+runs the comparison.
+"""
+
+import argparse
+import json
+import os
+import re
+import statistics
+import subprocess
+import sys
+import time
+import tracemalloc
+from collections.abc import Callable
+from typing import Any
+
+TOOLS_DIR = os.path.dirname(os.path.abspath(__file__))
+REPO_DIR = os.path.dirname(TOOLS_DIR)
+ELEMENT_DIR = os.path.join(REPO_DIR, "elements", "pl-truth-table")
+EXAMPLE_QUESTION = os.path.join(REPO_DIR, "questions", "truthTable", "question.html")
+BASELINE_PATH = os.path.join(TOOLS_DIR, "benchmark_baseline.json")
+
+sys.path.insert(0, ELEMENT_DIR)
+from truth_table_batch import load_controller
+
+REPEAT_DEFAULT = 5
+# Larger tables take minutes per case; include them with --max-rows
+MAX_ROWS_DEFAULT = 16384
+# Allowed slowdown/growth over the baseline before a comparison fails
+TOLERANCE_DEFAULT = 0.25
+# Timings below this many milliseconds are too noisy to compare
+MIN_COMPARED_MS = 1.0
+# Stop repeating a phase once its runs took this long in total
+MAX_REPEATED_MS = 2000.0
+
+PANELS = ("question", "submission", "answer")
+
+# Inputs of the table measured in fresh processes, for the cost of a newly
+# started worker; the same as the rows-256 case, but independent of --max-rows
+COLD_START_INPUTS = 8
+COLD_START_PHASES = {
+    "prepare": "prepare",
+    "render_question": "render",
+    "parse": "parse",
+    "grade": "grade",
+}
+# Modules only render needs, which prepare, parse and grade must not load
+RENDER_ONLY_MODULES = ("chevron", "hashlib")
+
+# Imports the controller and runs one phase on the data from stdin
+COLD_START_SCRIPT = """
+import importlib.util, json, sys, time
+
+controller_path, stub_dir, phase, element_html = sys.argv[1:5]
+render_only_modules = sys.argv[5:]
+data = json.load(sys.stdin)
+preloaded = [module for module in render_only_modules if module in sys.modules]
+
+start = time.perf_counter()
+try:
+    import prairielearn
+except ImportError:
+    sys.path.append(stub_dir)
+module_spec = importlib.util.spec_from_file_location("pl_truth_table", controller_path)
+controller = importlib.util.module_from_spec(module_spec)
+module_spec.loader.exec_module(controller)
+imported = time.perf_counter()
+getattr(controller, phase)(element_html, data)
+done = time.perf_counter()
+
+loaded = [
+    module
+    for module in render_only_modules
+    if module in sys.modules and module not in preloaded
+]
+print(json.dumps({
+    "import_ms": (imported - start) * 1000,
+    "phase_ms": (done - imported) * 1000,
+    "render_modules": len(loaded),
+}))
+"""
+
+
+def num_table_rows(num_inputs: int, bit_width: str = "1") -> int:
+    if "," in bit_width:
+        return 2 ** sum(int(x) for x in bit_width.strip("[]").split(","))
+    return 2 ** (int(bit_width) * num_inputs)
+
+
+def element_html(
+    name: str,
+    num_inputs: int,
+    bit_width: str = "1",
+    num_outputs: int = 1,
+    attributes: str = "",
+) -> str:
+    """A table with a generated correct answer for the given shape"""
+    num_rows = num_table_rows(num_inputs, bit_width)
+    inputs = ", ".join(f"X{j}" for j in range(num_inputs))
+    outputs = ", ".join(f"f{k}" for k in range(num_outputs))
+    columns = ", ".join(
+        "[" + ",".join(str((row >> k) & 1) for row in range(num_rows)) + "]"
+        for k in range(num_outputs)
+    )
+    return (
+        f'<pl-truth-table answers-name="{name}" input-name="[{inputs}]" '
+        f'output-name="[{outputs}]" bit-width="{bit_width}" '
+        f'correct-answer="{columns}"{attributes}></pl-truth-table>'
+    )
+
+
+def benchmark_cases(max_rows: int) -> dict[str, str]:
+    cases = {}
+    for num_inputs in range(2, 17, 2):
+        if 2**num_inputs <= max_rows:
+            cases[f"rows-{2**num_inputs}"] = element_html("q", num_inputs)
+    for bit_width, num_inputs in (("2", 4), ("[4, 4, 4]", 3), ("[8, 8]", 2)):
+        if num_table_rows(num_inputs, bit_width) <= max_rows:
+            cases[f"bit-width-{bit_width.replace(' ', '')}"] = element_html(
+                "q", num_inputs, bit_width=bit_width
+            )
+    for num_outputs in (4, 8):
+        if 2**10 <= max_rows:
+            cases[f"outputs-{num_outputs}-rows-1024"] = element_html(
+                "q", 10, num_outputs=num_outputs
+            )
+    if 2**10 <= max_rows:
+        cases["compact-render-rows-1024"] = element_html(
+            "q", 10, attributes=' compact-render="true"'
+        )
+    with open(EXAMPLE_QUESTION, encoding="utf-8") as f:
+        examples = re.findall(
+            r"<pl-truth-table.*?</pl-truth-table>", f.read(), re.DOTALL
+        )
+    for index, html in enumerate(examples, 1):
+        cases[f"example-part-{index}"] = html
+    return cases
+
+
+def _round_trip(data: dict[str, Any]) -> dict[str, Any]:
+    """PrairieLearn stores data as JSON between the phases"""
+    return json.loads(json.dumps(data))
+
+
+def _json_size(value: Any) -> int:
+    return len(json.dumps(value, separators=(",", ":")).encode())
+
+
+def _submission(controller: Any, html: str, data: dict[str, Any]) -> dict[str, str]:
+    """Submitted answers with every 7th cell wrong"""
+    spec = controller.compile_spec(html)
+    true, false = spec.alphabet[0], spec.alphabet[1]
+    flip = {true: false, false: true}
+    submitted = {}
+    for k, column in enumerate(controller.get_correct_columns(spec, data)):
+        for row in range(spec.num_rows):
+            value = column.cell(row)
+            if row % 7 == 3:
+                value = flip.get(value[0], true) + value[1:]
+            submitted[f"{spec.name}_{row}_{k}"] = value
+    return submitted
+
+
+# A phase is a setup step that builds its input data (not measured) and the
+# element call that is measured
+Phase = tuple[Callable[[], Any], Callable[[Any], Any]]
+
+
+def lifecycle_phases(
+    controller: Any, html: str
+) -> tuple[dict[str, Phase], dict[str, int]]:
+    """Run every phase once, returning the phases to measure and output sizes"""
+    phases: dict[str, Phase] = {}
+    sizes: dict[str, int] = {}
+
+    def new_data() -> dict[str, Any]:
+        return {
+            "params": {},
+            "correct_answers": {},
+            "submitted_answers": {},
+            "format_errors": {},
+            "partial_scores": {},
+            "variant_seed": 1,
+        }
+
+    def prepare(data: dict[str, Any]) -> dict[str, Any]:
+        controller.prepare(html, data)
+        return data
+
+    # Every phase starts without the results of earlier runs, unless a warm
+    # phase fills the caches on purpose
+    def cold(setup: Callable[[], Any]) -> Callable[[], Any]:
+        def cold_setup() -> Any:
+            controller.clear_caches()
+            return setup()
+
+        return cold_setup
+
+    def render_setup(data: dict[str, Any], panel: str) -> Callable[[], Any]:
+        return cold(lambda: dict(_round_trip(data), panel=panel))
+
+    def render(data: dict[str, Any]) -> str:
+        return controller.render(html, data)
+
+    phases["prepare"] = (cold(new_data), prepare)
+    prepared = _round_trip(prepare(new_data()))
+    sizes["prepare_json"] = _json_size(prepared)
+
+    phases["render_question"] = (render_setup(prepared, "question"), render)
+    sizes["render_question_html"] = len(
+        render(dict(prepared, panel="question")).encode()
+    )
+
+    if controller.compile_spec(html).read_only:
+        return phases, sizes
+
+    raw = _submission(controller, html, prepared)
+
+    def parse_setup() -> dict[str, Any]:
+        data = _round_trip(prepared)
+        data["raw_submitted_answers"] = dict(raw)
+        data["submitted_answers"] = dict(raw)
+        return data
+
+    def parse(data: dict[str, Any]) -> dict[str, Any]:
+        controller.parse(html, data)
+        return data
+
+    phases["parse"] = (cold(parse_setup), parse)
+    parsed = _round_trip(parse(parse_setup()))
+    sizes["parse_json"] = _json_size(
+        {key: parsed[key] for key in ("submitted_answers", "format_errors")}
+    )
+
+    def grade(data: dict[str, Any]) -> dict[str, Any]:
+        controller.grade(html, data)
+        return data
+
+    phases["grade"] = (cold(lambda: _round_trip(parsed)), grade)
+    graded = _round_trip(grade(_round_trip(parsed)))
+    sizes["grade_json"] = _json_size(graded["partial_scores"])
+
+    for panel in PANELS:
+        phases[f"render_graded_{panel}"] = (render_setup(graded, panel), render)
+        html_size = len(render(dict(graded, panel=panel)).encode())
+        sizes[f"render_graded_{panel}_html"] = html_size
+
+    def cached_answer_setup() -> dict[str, Any]:
+        """The answer panel once it was rendered for another student"""
+        data = render_setup(graded, "answer")()
+        render(dict(data))
+        return data
+
+    phases["render_graded_answer_cached"] = (cached_answer_setup, render)
+    return phases, sizes
+
+
+def measure(controller: Any, html: str, repeat: int) -> dict[str, Any]:
+    phases, sizes = lifecycle_phases(controller, html)
+    result: dict[str, Any] = {"sizes": sizes, "time_ms": {}, "peak_kb": {}}
+    for phase, (setup, run) in phases.items():
+        timings: list[float] = []
+        # Slow phases of the largest tables are stable enough to run only once
+        while len(timings) < repeat and sum(timings) < MAX_REPEATED_MS:
+            data = setup()
+            start = time.perf_counter()
+            run(data)
+            timings.append((time.perf_counter() - start) * 1000)
+        result["time_ms"][phase] = round(statistics.median(timings), 3)
+
+        data = setup()
+        tracemalloc.start()
+        run(data)
+        _, peak = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+        result["peak_kb"][phase] = round(peak / 1024, 1)
+    return result
+
+
+def cold_start(controller: Any, html: str, repeat: int) -> dict[str, Any]:
+    """Import the controller and run each phase once, in a new process each time"""
+    phases, _ = lifecycle_phases(controller, html)
+    result: dict[str, Any] = {"sizes": {}, "time_ms": {}, "peak_kb": {}}
+    for phase, function in COLD_START_PHASES.items():
+        setup, _ = phases[phase]
+        runs = []
+        for _ in range(repeat):
+            process = subprocess.run(
+                [
+                    sys.executable,
+                    "-c",
+                    COLD_START_SCRIPT,
+                    os.path.join(ELEMENT_DIR, "pl-truth-table.py"),
+                    os.path.join(TOOLS_DIR, "stubs"),
+                    function,
+                    html,
+                    *RENDER_ONLY_MODULES,
+                ],
+                input=json.dumps(setup()),
+                capture_output=True,
+                text=True,
+                cwd=ELEMENT_DIR,
+                check=True,
+            )
+            runs.append(json.loads(process.stdout))
+        result["time_ms"][f"{phase}_import"] = round(
+            statistics.median(run["import_ms"] for run in runs), 3
+        )
+        result["time_ms"][phase] = round(
+            statistics.median(run["phase_ms"] for run in runs), 3
+        )
+        # Any render-only module loaded by another phase is a regression
+        result["sizes"][f"{phase}_render_modules"] = max(
+            run["render_modules"] for run in runs
+        )
+    return result
+
+
+def compare(
+    results: dict[str, Any], baseline: dict[str, Any], tolerance: float
+) -> list[str]:
+    """List every metric that regressed by more than the tolerance"""
+    regressions = []
+    for case, metrics in results.items():
+        if case not in baseline:
+            continue
+        for group in ("time_ms", "peak_kb", "sizes"):
+            for key, value in metrics[group].items():
+                old = baseline[case][group].get(key)
+                if old is None:
+                    continue
+                if group == "time_ms" and max(old, value) < MIN_COMPARED_MS:
+                    continue
+                if value > old * (1 + tolerance):
+                    regressions.append(f"{case} {group} {key}: {old} -> {value}")
+    return regressions
+
+
+def _print_times(case: str, result: dict[str, Any]) -> None:
+    print(
+        f"{case:28} "
+        + " ".join(f"{phase}={ms:.1f}ms" for phase, ms in result["time_ms"].items()),
+        flush=True,
+    )
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.split("\n")[0])
+    parser.add_argument("--repeat", type=int, default=REPEAT_DEFAULT)
+    parser.add_argument("--max-rows", type=int, default=MAX_ROWS_DEFAULT)
+    parser.add_argument("--filter", default="", help="only run matching cases")
+    parser.add_argument("--save", action="store_true", help="save as baseline")
+    parser.add_argument("--compare", action="store_true", help="compare to baseline")
+    parser.add_argument("--tolerance", type=float, default=TOLERANCE_DEFAULT)
+    parser.add_argument("--baseline", default=BASELINE_PATH)
+    args = parser.parse_args()
+
+    # Files cached by earlier runs would be served instead of rendering
+    os.environ.pop("PL_TRUTH_TABLE_RENDER_CACHE", None)
+    controller = load_controller()
+    # The template is read relative to the element directory, as in PrairieLearn
+    os.chdir(ELEMENT_DIR)
+
+    results = {}
+    cases = benchmark_cases(args.max_rows)
+    for case, html in cases.items():
+        if args.filter not in case:
+            continue
+        results[case] = measure(controller, html, args.repeat)
+        _print_times(case, results[case])
+    if args.filter in "cold-start":
+        results["cold-start"] = cold_start(
+            controller, element_html("q", COLD_START_INPUTS), args.repeat
+        )
+        _print_times("cold-start", results["cold-start"])
+
+    if args.save:
+        # Only the cases that were run are replaced in an existing baseline
+        baseline = {}
+        if os.path.exists(args.baseline):
+            with open(args.baseline, encoding="utf-8") as f:
+                baseline = json.load(f)
+        results = {**baseline, **results}
+        with open(args.baseline, "w", encoding="utf-8") as f:
+            json.dump(results, f, indent=2, sort_keys=True)
+            f.write("\n")
+    if args.compare:
+        with open(args.baseline, encoding="utf-8") as f:
+            baseline = json.load(f)
+        regressions = compare(results, baseline, args.tolerance)
+        for regression in regressions:
+            print(f"REGRESSION {regression}")
+        if regressions:
+            sys.exit(1)
+        print("No regressions against the baseline.")
+
+
+if __name__ == "__main__":
+    main()
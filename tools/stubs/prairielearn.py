@@ -0,0 +1,81 @@
+"""Minimal stand-in for the `prairielearn` module, for running pl-truth-table
+outside of PrairieLearn (batch regrading and benchmarks).
+
+Only the helpers used by the element controller are implemented, following the
+behavior of the real module. Never copy this file into a course.
+"""
+
+import uuid
+from typing import Any
+
+import lxml.html
+
+QuestionData = dict[str, Any]
+
+_TRUE_VALUES = {"true", "t", "1", "yes", "y", "on"}
+_FALSE_VALUES = {"false", "f", "0", "no", "n", "off"}
+
+
+def check_attribs(
+    element: lxml.html.HtmlElement,
+    required_attribs: list[str],
+    optional_attribs: list[str],
+) -> None:
+    for name in required_attribs:
+        if name not in element.attrib:
+            raise ValueError(f'Required attribute "{name}" missing')
+    extra_attribs = set(element.attrib) - set(required_attribs) - set(optional_attribs)
+    if extra_attribs:
+        raise ValueError(f'Unknown attribute "{min(extra_attribs)}"')
+
+
+def check_answers_names(data: QuestionData, name: str) -> None:
+    names = data.setdefault("answers_names", {})
+    if name in names:
+        raise KeyError(f'Duplicate "answers-name" attribute: "{name}"')
+    names[name] = True
+
+
+def get_string_attrib(element: lxml.html.HtmlElement, name: str, *args: Any) -> Any:
+    if name in element.attrib:
+        return element.attrib[name]
+    if args:
+        return args[0]
+    raise ValueError(f'Attribute "{name}" missing and no default is available')
+
+
+def get_boolean_attrib(element: lxml.html.HtmlElement, name: str, *args: Any) -> Any:
+    if name not in element.attrib:
+        if args:
+            return args[0]
+        raise ValueError(f'Attribute "{name}" missing and no default is available')
+    value = element.attrib[name].strip().lower()
+    if value in _TRUE_VALUES:
+        return True
+    if value in _FALSE_VALUES:
+        return False
+    raise ValueError(f'Attribute "{name}" must be a boolean value: {value}')
+
+
+def to_json(value: Any) -> Any:
+    return value
+
+
+def from_json(value: Any) -> Any:
+    return value
+
+
+def escape_unicode_string(value: str) -> str:
+    return value
+
+
+def get_uuid() -> str:
+    return str(uuid.uuid4())
+
+
+def determine_score_params(score: float) -> tuple[str, bool | float]:
+    if score >= 1:
+        return ("correct", True)
+    if score > 0:
+        return ("partial", round(score * 100, 2))
+    return ("incorrect", True)